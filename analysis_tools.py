@@ -0,0 +1,628 @@
+import pandas as pd
+import matplotlib.pyplot as plt
+import seaborn as sns
+import io
+import base64
+import json
+import logging
+import threading
+
+import caches
+import query_engine
+
+logger = logging.getLogger(__name__)
+
+
+# --- Configurações para melhor visualização dos gráficos ---
+sns.set_style("whitegrid")
+plt.rcParams['figure.figsize'] = (10, 6)
+plt.rcParams['figure.dpi'] = 100
+plt.rcParams['font.family'] = 'sans-serif'
+plt.rcParams['font.sans-serif'] = ['DejaVu Sans', 'Arial', 'Helvetica', 'sans-serif']
+
+# --- Formato dos resultados das ferramentas ---
+# Cada ferramenta devolve dados tipados (colunas com tipo e unidade, linhas, totais e o contexto da consulta);
+# a redação da resposta fica a cargo do modelo. Mensagens de erro/ausência de dados continuam em 'text'.
+# O gráfico (image_base64) é usado só para exibição no Streamlit e não é enviado ao modelo.
+
+# Número máximo de linhas enviadas ao modelo em cada function_response
+MAX_MODEL_ROWS = 20
+
+# Colunas numéricas que não são valores em R$
+NON_MONETARY_COLUMNS = {
+    'ANO_REFER': 'ano',
+    'NUM_MEMBROS_REMUNERADOS_TOTAL': 'membros',
+    'NUM_MEMBROS_REMUNERADOS_MIN_MAX_MEDIA': 'membros',
+    'QTD_MEMBROS_REMUNERADOS_ACAO': 'membros',
+    'QTD_MEMBROS_REMUNERADOS_VARIAVEL': 'membros',
+    'DILUICAO_POTENCIAL': '%',
+    'PCT_REMUNERACAO_FIXA': '%',
+    'PCT_REMUNERACAO_VARIAVEL': '%',
+    'PCT_REMUNERACAO_ACOES': '%',
+}
+
+
+def _column(name: str, type_: str, unit: str = None) -> dict:
+    return {'name': name, 'type': type_, 'unit': unit}
+
+
+def _table_result(data: pd.DataFrame, columns: list, context: dict, totals: dict = None, image_base64: str = None,
+                  row_count: int = None) -> dict:
+    # row_count: número de linhas do resultado completo, quando `data` já chega limitado
+    data = data[[c['name'] for c in columns]]
+    rows = data.astype(object).where(data.notna(), None).values.tolist()
+    result = {'context': context, 'columns': columns, 'rows': rows, 'totals': totals or {}, 'image_base64': image_base64}
+    if row_count is not None:
+        result['row_count'] = int(row_count)
+    return result
+
+
+def _compact_column(column: dict) -> dict:
+    # Sem campos vazios: 'type' omitido quando numérico (o padrão) e 'unit' omitida quando não há unidade
+    compact = {'name': column['name']}
+    if column['type'] != 'number':
+        compact['type'] = column['type']
+    if column['unit'] is not None:
+        compact['unit'] = column['unit']
+    return compact
+
+
+def _compact_value(value):
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float):
+        return round(value, 2)
+    return value
+
+
+def _format_value(value, unit):
+    if value is None:
+        return "n/d"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if unit == 'BRL':
+            return f"R$ {value:,.2f}"
+        if unit == '%':
+            return f"{value:,.2f}%"
+        if unit == 'ano':
+            return f"{int(value)}"
+        return f"{value:,.2f}"
+    return str(value)
+
+
+def render_text(tool_output: dict) -> str:
+    # Versão em prosa (lista de itens) do resultado estruturado, com todas as linhas
+    if 'columns' not in tool_output:
+        return tool_output.get('text', '')
+    context = ", ".join(f"{k}: {v}" for k, v in tool_output['context'].items())
+    lines = [f"Resultado ({context}):"]
+    for row in tool_output['rows']:
+        lines.append("- " + "; ".join(f"{c['name']}: {_format_value(_compact_value(v), c['unit'])}"
+                                      for c, v in zip(tool_output['columns'], row)))
+    units = {c['name']: c['unit'] for c in tool_output['columns']}
+    for name, value in tool_output['totals'].items():
+        lines.append(f"Total {name}: {_format_value(_compact_value(value), units.get(name))}")
+    if tool_output.get('row_count', len(tool_output['rows'])) > len(tool_output['rows']):
+        lines.append(f"({len(tool_output['rows'])} de {tool_output['row_count']} linhas)")
+    return "\n".join(lines) + "\n"
+
+
+def model_payload(tool_output: dict, output_format: str = 'structured') -> dict:
+    # Conteúdo enviado ao Gemini como function_response
+    if 'columns' not in tool_output:
+        return {'text': tool_output.get('text', '')}
+    if output_format == 'text':
+        # Lista em prosa gerada a partir do resultado estruturado, com todas as linhas e o gráfico embutido.
+        # Não reproduz o texto redigido à mão pelas versões antigas de cada ferramenta.
+        return {'text': render_text(tool_output), 'image_base64': tool_output.get('image_base64')}
+    rows = tool_output['rows']
+    row_count = tool_output.get('row_count', len(rows))
+    sent_rows = rows[:MAX_MODEL_ROWS]
+    payload = {
+        'context': tool_output['context'],
+        'columns': [_compact_column(c) for c in tool_output['columns']],
+        'rows': [[_compact_value(v) for v in row] for row in sent_rows],
+    }
+    # row_count/truncated só quando nem todas as linhas foram enviadas
+    if row_count > len(sent_rows):
+        payload['row_count'] = row_count
+        payload['truncated'] = True
+    if tool_output['totals']:
+        payload['totals'] = {k: _compact_value(v) for k, v in tool_output['totals'].items()}
+    if tool_output.get('image_base64'):
+        payload['chart'] = 'gráfico exibido ao usuário'
+    return payload
+
+
+def _render_chart() -> str:
+    buf = io.BytesIO()
+    plt.savefig(buf, format='png')
+    buf.seek(0)
+    image_base64 = base64.b64encode(buf.read()).decode('utf-8')
+    plt.close()
+    return image_base64
+
+
+# --- 3. Definição das Funções de Consulta (Ferramentas) ---
+# Todas as funções get_... aqui, com as conversões int() e retorno dict.
+
+def get_salario_medio_diretoria(df, year: int) -> dict:
+    year = int(year)
+    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta."}
+    if 'SALARIO' not in df.columns or 'ORGAO_ADMINISTRACAO' not in df.columns or 'ANO_REFER' not in df.columns:
+        return {'text': "Colunas necessárias (SALARIO, ORGAO_ADMINISTRACAO, ANO_REFER) não encontradas."}
+    result = query_engine.aggregate(df, metrics=[{'column': 'SALARIO', 'agg': 'mean'}],
+                                    filters=[{'column': 'ORGAO_ADMINISTRACAO', 'op': 'contains', 'value': 'DIRETORIA'},
+                                             {'column': 'ANO_REFER', 'op': 'eq', 'value': year}])
+    if result.empty:
+        return {'text': f"Nenhum dado encontrado para 'DIRETORIA' no ano {year}."}
+    return _table_result(result, [_column('SALARIO_mean', 'number', 'BRL')],
+                         context={'orgao': 'DIRETORIA', 'ano': year, 'metrica': 'salário médio'})
+
+def get_top_companies_by_salary(df, num_companies: int, year: int = None) -> dict:
+    num_companies = int(num_companies)
+    if year is not None:
+        year = int(year)
+    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta.", 'image_base64': None}
+    if 'SALARIO' not in df.columns or 'NOME_COMPANHIA' not in df.columns or 'ANO_REFER' not in df.columns:
+        return {'text': "Colunas necessárias (SALARIO, NOME_COMPANHIA, ANO_REFER) não encontradas.", 'image_base64': None}
+    if year is None:
+        year_display = int(query_engine.aggregate(df, metrics=[{'column': 'ANO_REFER', 'agg': 'max'}]).loc[0, 'ANO_REFER_max'])
+    else:
+        year_display = year
+    top_companies = query_engine.aggregate(df, metrics=[{'column': 'SALARIO', 'agg': 'sum'}], group_by=['NOME_COMPANHIA'],
+                                           filters=[{'column': 'ANO_REFER', 'op': 'eq', 'value': year_display}],
+                                           order={'by': 'SALARIO_sum', 'direction': 'desc'}, limit=num_companies)
+    top_companies = top_companies.rename(columns={'SALARIO_sum': 'SALARIO'})
+    if top_companies.empty:
+        return {'text': f"Nenhuma empresa encontrada com dados de salário para o ano {year_display}.", 'image_base64': None}
+    try:
+        plt.figure(figsize=(12, 7))
+        sns.barplot(x='SALARIO', y='NOME_COMPANHIA', data=top_companies, palette='viridis', hue='NOME_COMPANHIA', legend=False)
+        plt.title(f'Top {num_companies} Empresas por Salário Total em {year_display}')
+        plt.xlabel('Salário Total (R$)')
+        plt.ylabel('Nome da Companhia')
+        plt.ticklabel_format(style='plain', axis='x')
+        plt.tight_layout()
+        image_base64 = _render_chart()
+        return _table_result(top_companies, [_column('NOME_COMPANHIA', 'string'), _column('SALARIO', 'number', 'BRL')],
+                             context={'ano': year_display, 'metrica': 'soma de SALARIO por empresa', 'top': num_companies},
+                             totals={'SALARIO': top_companies['SALARIO'].sum()}, image_base64=image_base64)
+    except Exception as e:
+        plt.close()
+        return {'text': f"ERRO ao gerar o gráfico de Top Empresas por Salário: {e}", 'image_base64': None}
+
+def get_total_bonus_by_company(df, company_name: str, year: int, exact_match: bool = False) -> dict:
+    year = int(year)
+    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta."}
+    if 'BONUS' not in df.columns or 'NOME_COMPANHIA' not in df.columns or 'ANO_REFER' not in df.columns:
+        return {'text': "Colunas necessárias (BONUS, NOME_COMPANHIA, ANO_REFER) não encontradas."}
+    result = query_engine.aggregate(df, metrics=[{'column': 'BONUS', 'agg': 'sum'}],
+                                    filters=[{'column': 'NOME_COMPANHIA', 'op': 'eq' if exact_match else 'contains', 'value': company_name},
+                                             {'column': 'ANO_REFER', 'op': 'eq', 'value': year}])
+    if result.empty:
+        return {'text': f"Nenhum dado de bônus encontrado para '{company_name}' (busca {'exata' if exact_match else 'parcial'}) no ano {year}. Verifique o nome da empresa ou o ano."}
+    return _table_result(result, [_column('BONUS_sum', 'number', 'BRL')],
+                         context={'empresa': company_name, 'busca': 'exata' if exact_match else 'parcial', 'ano': year, 'metrica': 'bônus total'})
+
+def get_sector_bonus_range(df, sector_name: str, year: int) -> dict:
+    year = int(year)
+    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta."}
+    if 'BONUS_VALOR_EFETIVO' not in df.columns and 'BONUS' not in df.columns:
+        return {'text': "Nenhuma coluna de bônus (BONUS_VALOR_EFETIVO ou BONUS) encontrada para análise."}
+    if 'SETOR_DE_ATIVDADE' not in df.columns or 'ANO_REFER' not in df.columns:
+        return {'text': "Colunas necessárias (SETOR_DE_ATIVDADE, ANO_REFER) não encontradas."}
+    bonus_col = 'BONUS_VALOR_EFETIVO' if 'BONUS_VALOR_EFETIVO' in df.columns else 'BONUS'
+    if bonus_col not in df.columns:
+           return {'text': f"Coluna de bônus '{bonus_col}' não encontrada."}
+    result = query_engine.aggregate(df, metrics=[{'column': bonus_col, 'agg': agg} for agg in ('min', 'max', 'mean')],
+                                    filters=[{'column': 'SETOR_DE_ATIVDADE', 'op': 'contains', 'value': sector_name},
+                                             {'column': 'ANO_REFER', 'op': 'eq', 'value': year}])
+    if result.empty:
+        return {'text': f"Nenhum dado de bônus encontrado para o setor '{sector_name}' no ano {year}."}
+    return _table_result(result, [_column(f'{bonus_col}_{agg}', 'number', 'BRL') for agg in ('min', 'max', 'mean')],
+                         context={'setor': sector_name, 'ano': year, 'metrica': 'faixa de bônus por registro'})
+
+def get_remuneration_trend_by_orgao(df, orgao: str, start_year: int, end_year: int) -> dict:
+    start_year = int(start_year)
+    end_year = int(end_year)
+    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta.", 'image_base64': None}
+    if 'VALOR_MEDIO_REMUNERACAO' not in df.columns and 'TOTAL_REMUNERACAO_ORGAO' not in df.columns:
+        return {'text': "Nenhuma coluna de remuneração (VALOR_MEDIO_REMUNERACAO ou TOTAL_REMUNERACAO_ORGAO) encontrada para análise de tendência.", 'image_base64': None}
+    if 'ORGAO_ADMINISTRACAO' not in df.columns or 'ANO_REFER' not in df.columns:
+        return {'text': "Colunas necessárias (ORGAO_ADMINISTRACAO, ANO_REFER) não encontradas."}
+    remuneration_col = 'VALOR_MEDIO_REMUNERACAO' if 'VALOR_MEDIO_REMUNERACAO' in df.columns else 'TOTAL_REMUNERACAO_ORGAO'
+    if remuneration_col not in df.columns:
+        return {'text': f"Coluna de remuneração '{remuneration_col}' não encontrada.", 'image_base64': None}
+    trend_data = query_engine.aggregate(df, metrics=[{'column': remuneration_col, 'agg': 'mean'}], group_by=['ANO_REFER'],
+                                        filters=[{'column': 'ORGAO_ADMINISTRACAO', 'op': 'contains', 'value': orgao},
+                                                 {'column': 'ANO_REFER', 'op': 'between', 'values': [start_year, end_year]}],
+                                        order={'by': 'ANO_REFER', 'direction': 'asc'})
+    if trend_data.empty:
+        return {'text': f"Nenhum dado encontrado para o órgão '{orgao}' entre os anos {start_year} e {end_year}.", 'image_base64': None}
+    trend_data = trend_data.rename(columns={f'{remuneration_col}_mean': remuneration_col})
+    try:
+        plt.figure(figsize=(12, 7))
+        sns.lineplot(x='ANO_REFER', y=remuneration_col, data=trend_data, marker='o')
+        plt.title(f'Tendência da Remuneração Média de {orgao} ({start_year}-{end_year})')
+        plt.xlabel('Ano de Referência')
+        plt.ylabel(f'Remuneração Média ({remuneration_col}) (R$)')
+        plt.ticklabel_format(style='plain', axis='y')
+        plt.xticks(trend_data['ANO_REFER'])
+        plt.tight_layout()
+        image_base64 = _render_chart()
+        return _table_result(trend_data, [_column('ANO_REFER', 'integer', 'ano'), _column(remuneration_col, 'number', 'BRL')],
+                             context={'orgao': orgao, 'periodo': f"{start_year}-{end_year}", 'metrica': f'média de {remuneration_col} por ano'},
+                             image_base64=image_base64)
+    except Exception as e:
+        plt.close()
+        return {'text': f"ERRO ao gerar o gráfico de Tendência de Remuneração: {e}", 'image_base64': None}
+
+def get_avg_bonus_effective_by_sector(df, sector_name: str, year: int) -> dict:
+    year = int(year)
+    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta."}
+    if 'BONUS_VALOR_EFETIVO' not in df.columns and 'BONUS' not in df.columns:
+        return {'text': "Nenhuma coluna de bônus (BONUS_VALOR_EFETIVO ou BONUS) encontrada para análise."}
+    if 'SETOR_DE_ATIVDADE' not in df.columns or 'ANO_REFER' not in df.columns:
+        return {'text': "Colunas necessárias (SETOR_DE_ATIVDADE, ANO_REFER) não encontradas."}
+    bonus_col = 'BONUS_VALOR_EFETIVO' if 'BONUS_VALOR_EFETIVO' in df.columns else 'BONUS'
+    if bonus_col not in df.columns:
+           return {'text': f"Coluna de bônus '{bonus_col}' não encontrada."}
+    result = query_engine.aggregate(df, metrics=[{'column': bonus_col, 'agg': 'mean'}],
+                                    filters=[{'column': 'SETOR_DE_ATIVDADE', 'op': 'contains', 'value': sector_name},
+                                             {'column': 'ANO_REFER', 'op': 'eq', 'value': year}])
+    if result.empty:
+        return {'text': f"Nenhum dado de bônus efetivo encontrado para o setor '{sector_name}' no ano {year}."}
+    return _table_result(result, [_column(f'{bonus_col}_mean', 'number', 'BRL')],
+                         context={'setor': sector_name, 'ano': year, 'metrica': 'bônus efetivo médio'})
+
+def get_top_sectors_by_avg_total_remuneration(df, num_sectors: int, year: int) -> dict:
+    num_sectors = int(num_sectors)
+    year = int(year)
+    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta.", 'image_base64': None}
+    if 'TOTAL_REMUNERACAO_ORGAO' not in df.columns or 'SETOR_DE_ATIVDADE' not in df.columns or 'ANO_REFER' not in df.columns:
+        return {'text': "Colunas necessárias (TOTAL_REMUNERACAO_ORGAO, SETOR_DE_ATIVDADE, ANO_REFER) não encontradas.", 'image_base64': None}
+    avg_remuneration_by_sector = query_engine.aggregate(df, metrics=[{'column': 'TOTAL_REMUNERACAO_ORGAO', 'agg': 'mean'}], group_by=['SETOR_DE_ATIVDADE'],
+                                                        filters=[{'column': 'ANO_REFER', 'op': 'eq', 'value': year}],
+                                                        order={'by': 'TOTAL_REMUNERACAO_ORGAO_mean', 'direction': 'desc'}, limit=num_sectors)
+    avg_remuneration_by_sector = avg_remuneration_by_sector.rename(columns={'TOTAL_REMUNERACAO_ORGAO_mean': 'TOTAL_REMUNERACAO_ORGAO'})
+    if avg_remuneration_by_sector.empty:
+        return {'text': f"Nenhum setor encontrado com remuneração média total para o ano {year}.", 'image_base64': None}
+    try:
+        plt.figure(figsize=(12, 7))
+        sns.barplot(x='TOTAL_REMUNERACAO_ORGAO', y='SETOR_DE_ATIVDADE', data=avg_remuneration_by_sector, palette='magma', hue='SETOR_DE_ATIVDADE', legend=False)
+        plt.title(f'Top {num_sectors} Setores por Remuneração Média Total em {year}')
+        plt.xlabel('Remuneração Média Total (R$)')
+        plt.ylabel('Setor de Atividade')
+        plt.ticklabel_format(style='plain', axis='x')
+        plt.tight_layout()
+        image_base64 = _render_chart()
+        return _table_result(avg_remuneration_by_sector, [_column('SETOR_DE_ATIVDADE', 'string'), _column('TOTAL_REMUNERACAO_ORGAO', 'number', 'BRL')],
+                             context={'ano': year, 'metrica': 'média de TOTAL_REMUNERACAO_ORGAO por setor', 'top': num_sectors},
+                             image_base64=image_base64)
+    except Exception as e:
+        plt.close()
+        return {'text': f"ERRO ao gerar o gráfico de Top Setores por Remuneração: {e}", 'image_base64': None}
+
+def get_remuneration_as_percentage_of_revenue(df, num_companies: int, sector_name: str, year: int) -> dict:
+    num_companies = int(num_companies)
+    year = int(year)
+    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta."}
+    if 'TOTAL_REMUNERACAO_ORGAO' not in df.columns or 'RECEITA' not in df.columns or \
+       'SETOR_DE_ATIVDADE' not in df.columns or 'ANO_REFER' not in df.columns or \
+       'NOME_COMPANHIA' not in df.columns:
+        return {'text': "Colunas necessárias (TOTAL_REMUNERACAO_ORGAO, RECEITA, SETOR_DE_ATIVDADE, ANO_REFER, NOME_COMPANHIA) não encontradas."}
+    filtered_df = query_engine.scan(df, ['NOME_COMPANHIA', 'TOTAL_REMUNERACAO_ORGAO', 'RECEITA'],
+                                    filters=[{'column': 'SETOR_DE_ATIVDADE', 'op': 'contains', 'value': sector_name},
+                                             {'column': 'ANO_REFER', 'op': 'eq', 'value': year}])
+    if filtered_df.empty:
+        return {'text': f"Nenhum dado encontrado para o setor '{sector_name}' no ano {year}."}
+    company_data = filtered_df.groupby('NOME_COMPANHIA').agg(
+        Total_Remuneracao=('TOTAL_REMUNERACAO_ORGAO', 'sum'),
+        Receita=('RECEITA', 'sum')
+    ).reset_index()
+    company_data = company_data[company_data['Receita'].fillna(0) > 0]
+    if company_data.empty:
+        return {'text': f"Nenhuma empresa com receita válida encontrada para o setor '{sector_name}' no ano {year}."}
+    company_data['Remuneracao_Percentual_Receita'] = (company_data['Total_Remuneracao'] / company_data['Receita']) * 100
+    top_companies = company_data.nlargest(num_companies, 'Receita')
+    top_companies = top_companies.sort_values(by='Remuneracao_Percentual_Receita', ascending=False)
+    return _table_result(top_companies, [_column('NOME_COMPANHIA', 'string'), _column('Receita', 'number', 'BRL'),
+                                         _column('Total_Remuneracao', 'number', 'BRL'), _column('Remuneracao_Percentual_Receita', 'number', '%')],
+                         context={'setor': sector_name, 'ano': year, 'top': num_companies, 'ordenacao': 'percentual desc'})
+
+def get_correlation_members_bonus(df, year: int) -> dict:
+    year = int(year)
+    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta.", 'image_base64': None}
+    if 'NUM_MEMBROS_REMUNERADOS_TOTAL' not in df.columns or 'BONUS' not in df.columns or \
+       'NOME_COMPANHIA' not in df.columns or 'ANO_REFER' not in df.columns:
+        return {'text': "Colunas necessárias (NUM_MEMBROS_REMUNERADOS_TOTAL, BONUS, NOME_COMPANHIA, ANO_REFER) não encontradas."}
+    company_aggregated = query_engine.aggregate(df, metrics=[{'column': 'NUM_MEMBROS_REMUNERADOS_TOTAL', 'agg': 'sum'}, {'column': 'BONUS', 'agg': 'sum'}],
+                                                group_by=['NOME_COMPANHIA'], filters=[{'column': 'ANO_REFER', 'op': 'eq', 'value': year}])
+    if company_aggregated.empty:
+        return {'text': f"Nenhum dado encontrado para o ano {year}.", 'image_base64': None}
+    company_aggregated = company_aggregated.rename(columns={'NUM_MEMBROS_REMUNERADOS_TOTAL_sum': 'Total_Membros_Remunerados', 'BONUS_sum': 'Total_Bonus'})
+    company_aggregated = company_aggregated.dropna(subset=['Total_Membros_Remunerados', 'Total_Bonus'])
+    company_aggregated = company_aggregated[(company_aggregated['Total_Membros_Remunerados'] > 0) &
+                                            (company_aggregated['Total_Bonus'] > 0)]
+    if company_aggregated.empty:
+        return {'text': f"Dados insuficientes para calcular a correlação entre membros remunerados e bônus para o ano {year}.", 'image_base64': None}
+    # Bônus por membro da empresa (todos os órgãos somados), calculado de propósito após a agregação: a coluna
+    # derivada BONUS_POR_MEMBRO é por órgão, e a média das razões dos órgãos não é o bônus por membro da empresa
+    company_aggregated['Bonus_Por_Membro'] = company_aggregated['Total_Bonus'] / company_aggregated['Total_Membros_Remunerados']
+    correlation = company_aggregated['Total_Membros_Remunerados'].corr(company_aggregated['Total_Bonus'])
+    # Empresas com mais membros pagam mais bônus por pessoa?
+    correlation_per_member = company_aggregated['Total_Membros_Remunerados'].corr(company_aggregated['Bonus_Por_Membro'])
+    # Com menos de duas empresas ou valores constantes a correlação é indefinida (NaN): reportada como ausente
+    correlation = None if pd.isna(correlation) else correlation
+    correlation_per_member = None if pd.isna(correlation_per_member) else correlation_per_member
+    try:
+        plt.figure(figsize=(12, 7))
+        sns.scatterplot(x='Total_Membros_Remunerados', y='Total_Bonus', data=company_aggregated, hue='NOME_COMPANHIA', legend='brief', s=100)
+        plt.title(f'Correlação entre Membros Remunerados e Bônus Total por Empresa em {year}\n'
+                  f'Correlação: {_format_value(_compact_value(correlation), None)}')
+        plt.xlabel('Número Total de Membros Remunerados')
+        plt.ylabel('Bônus Total (R$)')
+        plt.ticklabel_format(style='plain', axis='y')
+        plt.tight_layout()
+        if len(company_aggregated['NOME_COMPANHIA'].unique()) > 10:
+            plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left', borderaxespad=0.)
+        else:
+            plt.legend(loc='best')
+        image_base64 = _render_chart()
+        # Empresas ordenadas por bônus: se a lista for truncada para o modelo, ficam os pontos mais relevantes
+        company_aggregated = company_aggregated.sort_values('Total_Bonus', ascending=False)
+        return _table_result(company_aggregated, [_column('NOME_COMPANHIA', 'string'), _column('Total_Membros_Remunerados', 'number', 'membros'),
+                                                  _column('Total_Bonus', 'number', 'BRL'), _column('Bonus_Por_Membro', 'number', 'BRL')],
+                             context={'ano': year, 'metrica': 'correlação de Pearson entre membros remunerados e bônus total por empresa'},
+                             totals={'correlacao': correlation, 'correlacao_membros_bonus_por_membro': correlation_per_member,
+                                     'empresas': len(company_aggregated)},
+                             image_base64=image_base64)
+    except Exception as e:
+        plt.close()
+        return {'text': f"ERRO ao gerar o gráfico de Correlação: {e}", 'image_base64': None}
+
+def get_avg_remuneration_by_orgao_segment(df, orgao_name: str, year: int) -> dict:
+    year = int(year)
+    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta.", 'image_base64': None}
+    if 'TOTAL_REMUNERACAO_ORGAO' not in df.columns or 'ORGAO_ADMINISTRACAO' not in df.columns or \
+       'SETOR_DE_ATIVDADE' not in df.columns or 'ANO_REFER' not in df.columns:
+        return {'text': "Colunas necessárias (TOTAL_REMUNERACAO_ORGAO, ORGAO_ADMINISTRACAO, SETOR_DE_ATIVDADE, ANO_REFER) não encontradas."}
+    remuneration_by_segment = query_engine.aggregate(df, metrics=[{'column': 'TOTAL_REMUNERACAO_ORGAO', 'agg': 'mean'}], group_by=['SETOR_DE_ATIVDADE'],
+                                                     filters=[{'column': 'ORGAO_ADMINISTRACAO', 'op': 'contains', 'value': orgao_name},
+                                                              {'column': 'ANO_REFER', 'op': 'eq', 'value': year}],
+                                                     order={'by': 'TOTAL_REMUNERACAO_ORGAO_mean', 'direction': 'desc'})
+    remuneration_by_segment = remuneration_by_segment.rename(columns={'TOTAL_REMUNERACAO_ORGAO_mean': 'TOTAL_REMUNERACAO_ORGAO'})
+    if remuneration_by_segment.empty:
+        return {'text': f"Nenhum dado de remuneração média por segmento encontrado para o órgão '{orgao_name}' no ano {year}.", 'image_base64': None}
+    try:
+        plt.figure(figsize=(12, 7))
+        sns.barplot(x='TOTAL_REMUNERACAO_ORGAO', y='SETOR_DE_ATIVDADE', data=remuneration_by_segment, palette='crest', hue='SETOR_DE_ATIVDADE', legend=False)
+        plt.title(f'Remuneração Média Total de {orgao_name} por Setor de Atividade em {year}')
+        plt.xlabel('Remuneração Média Total (R$)')
+        plt.ylabel('Setor de Atividade')
+        plt.ticklabel_format(style='plain', axis='x')
+        plt.tight_layout()
+        image_base64 = _render_chart()
+        return _table_result(remuneration_by_segment, [_column('SETOR_DE_ATIVDADE', 'string'), _column('TOTAL_REMUNERACAO_ORGAO', 'number', 'BRL')],
+                             context={'orgao': orgao_name, 'ano': year, 'metrica': 'média de TOTAL_REMUNERACAO_ORGAO por setor'},
+                             image_base64=image_base64)
+    except Exception as e:
+        plt.close()
+        return {'text': f"ERRO ao gerar o gráfico de Remuneração Média por Órgão e Segmento: {e}", 'image_base64': None}
+
+def get_remuneration_structure_proportion(df, orgao_name: str, year: int) -> dict:
+    year = int(year)
+    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta.", 'image_base64': None}
+    if 'ESTRUTURA_REMUNERACAO' not in df.columns:
+        return {'text': "Coluna 'ESTRUTURA_REMUNERACAO' necessária para a estrutura de remuneração não encontrada.", 'image_base64': None}
+    if 'ORGAO_ADMINISTRACAO' not in df.columns or 'ANO_REFER' not in df.columns:
+        return {'text': "Colunas necessárias (ORGAO_ADMINISTRACAO, ANO_REFER) não encontradas."}
+    # A estrutura (fixa / variável / ações) de cada registro já é classificada no carregamento
+    structure_counts = query_engine.aggregate(df, metrics=[{'column': 'ANO_REFER', 'agg': 'count'}], group_by=['ESTRUTURA_REMUNERACAO'],
+                                              filters=[{'column': 'ORGAO_ADMINISTRACAO', 'op': 'contains', 'value': orgao_name},
+                                                       {'column': 'ANO_REFER', 'op': 'eq', 'value': year}],
+                                              order={'by': 'ANO_REFER_count', 'direction': 'desc'})
+    if structure_counts.empty:
+        return {'text': f"Nenhum dado encontrado para o órgão '{orgao_name}' no ano {year}.", 'image_base64': None}
+    structure_counts.columns = ['Estrutura', 'Registros']
+    total_records = structure_counts['Registros'].sum()
+    structure_counts['Proporcao'] = structure_counts['Registros'] / total_records * 100
+    try:
+        plt.figure(figsize=(10, 8))
+        sns.barplot(x='Proporcao', y='Estrutura', data=structure_counts, palette='pastel', hue='Estrutura', legend=False)
+        plt.title(f'Estruturas de Remuneração para {orgao_name} em {year} (% de Ocorrências)')
+        plt.xlabel('Proporção (%)')
+        plt.ylabel('Estrutura de Remuneração')
+        plt.tight_layout()
+        image_base64 = _render_chart()
+        return _table_result(structure_counts, [_column('Estrutura', 'string'), _column('Proporcao', 'number', '%')],
+                             context={'orgao': orgao_name, 'ano': year, 'metrica': '% de registros por estrutura de remuneração'},
+                             totals={'registros': int(total_records)}, image_base64=image_base64)
+    except Exception as e:
+        plt.close()
+        return {'text': f"ERRO ao gerar o gráfico de Estruturas de Remuneração: {e}", 'image_base64': None}
+
+def get_top_bottom_remuneration_values(df, orgao_name: str, year: int, num_companies: int = 5) -> dict:
+    year = int(year)
+    num_companies = int(num_companies)
+    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta."}
+    if 'TOTAL_REMUNERACAO_ORGAO' not in df.columns or 'NOME_COMPANHIA' not in df.columns or \
+       'ORGAO_ADMINISTRACAO' not in df.columns or 'ANO_REFER' not in df.columns:
+        return {'text': "Colunas necessárias (TOTAL_REMUNERACAO_ORGAO, NOME_COMPANHIA, ORGAO_ADMINISTRACAO, ANO_REFER) não encontradas."}
+    unique_remuneration = query_engine.aggregate(df, metrics=[{'column': 'TOTAL_REMUNERACAO_ORGAO', 'agg': 'sum'}],
+                                                 group_by=['NOME_COMPANHIA', 'ORGAO_ADMINISTRACAO', 'ANO_REFER'],
+                                                 filters=[{'column': 'ORGAO_ADMINISTRACAO', 'op': 'contains', 'value': orgao_name},
+                                                          {'column': 'ANO_REFER', 'op': 'eq', 'value': year}])
+    if unique_remuneration.empty:
+        return {'text': f"Nenhum dado encontrado para o órgão '{orgao_name}' no ano {year}."}
+    unique_remuneration = unique_remuneration.rename(columns={'TOTAL_REMUNERACAO_ORGAO_sum': 'TOTAL_REMUNERACAO_ORGAO'})
+    top_values = unique_remuneration.nlargest(num_companies, 'TOTAL_REMUNERACAO_ORGAO').assign(Posicao='maiores')
+    # Menores excluem zeros/nulos
+    bottom_values = unique_remuneration[unique_remuneration['TOTAL_REMUNERACAO_ORGAO'] > 0].nsmallest(num_companies, 'TOTAL_REMUNERACAO_ORGAO').assign(Posicao='menores')
+    return _table_result(pd.concat([top_values, bottom_values], ignore_index=True),
+                         [_column('Posicao', 'string'), _column('NOME_COMPANHIA', 'string'), _column('ORGAO_ADMINISTRACAO', 'string'),
+                          _column('TOTAL_REMUNERACAO_ORGAO', 'number', 'BRL')],
+                         context={'orgao': orgao_name, 'ano': year, 'n': num_companies, 'metrica': 'remuneração total do órgão por empresa'})
+
+def get_top_remuneration_per_member(df, orgao_name: str, year: int, num_companies: int = 10) -> dict:
+    year = int(year)
+    num_companies = int(num_companies)
+    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta.", 'image_base64': None}
+    if 'REMUNERACAO_POR_MEMBRO' not in df.columns or 'NOME_COMPANHIA' not in df.columns or \
+       'ORGAO_ADMINISTRACAO' not in df.columns or 'ANO_REFER' not in df.columns:
+        return {'text': "Colunas necessárias (REMUNERACAO_POR_MEMBRO, NOME_COMPANHIA, ORGAO_ADMINISTRACAO, ANO_REFER) não encontradas.", 'image_base64': None}
+    # Um grupo por empresa e órgão: "Conselho" casa com o de Administração e o Fiscal, que não podem ser misturados
+    per_member = query_engine.aggregate(df, metrics=[{'column': 'REMUNERACAO_POR_MEMBRO', 'agg': 'mean'}, {'column': 'NUM_MEMBROS_REMUNERADOS_TOTAL', 'agg': 'mean'}],
+                                        group_by=['NOME_COMPANHIA', 'ORGAO_ADMINISTRACAO'],
+                                        filters=[{'column': 'ORGAO_ADMINISTRACAO', 'op': 'contains', 'value': orgao_name},
+                                                 {'column': 'ANO_REFER', 'op': 'eq', 'value': year},
+                                                 {'column': 'REMUNERACAO_POR_MEMBRO', 'op': 'gt', 'value': 0}],
+                                        order={'by': 'REMUNERACAO_POR_MEMBRO_mean', 'direction': 'desc'}, limit=num_companies)
+    if per_member.empty:
+        return {'text': f"Nenhum dado de remuneração por membro encontrado para o órgão '{orgao_name}' no ano {year}.", 'image_base64': None}
+    per_member = per_member.rename(columns={'REMUNERACAO_POR_MEMBRO_mean': 'REMUNERACAO_POR_MEMBRO', 'NUM_MEMBROS_REMUNERADOS_TOTAL_mean': 'NUM_MEMBROS_REMUNERADOS_TOTAL'})
+    # Rótulo do gráfico: o órgão só é acrescentado quando o filtro casou com mais de um
+    per_member['Empresa_Orgao'] = per_member['NOME_COMPANHIA']
+    if per_member['ORGAO_ADMINISTRACAO'].nunique() > 1:
+        per_member['Empresa_Orgao'] = per_member['NOME_COMPANHIA'] + ' (' + per_member['ORGAO_ADMINISTRACAO'] + ')'
+    try:
+        plt.figure(figsize=(12, 7))
+        sns.barplot(x='REMUNERACAO_POR_MEMBRO', y='Empresa_Orgao', data=per_member, palette='rocket', hue='Empresa_Orgao', legend=False)
+        plt.title(f'Top {num_companies} Empresas por Remuneração por Membro de {orgao_name} em {year}')
+        plt.xlabel('Remuneração Total por Membro (R$)')
+        plt.ylabel('Nome da Companhia')
+        plt.ticklabel_format(style='plain', axis='x')
+        plt.tight_layout()
+        image_base64 = _render_chart()
+        return _table_result(per_member, [_column('NOME_COMPANHIA', 'string'), _column('ORGAO_ADMINISTRACAO', 'string'),
+                                          _column('REMUNERACAO_POR_MEMBRO', 'number', 'BRL'),
+                                          _column('NUM_MEMBROS_REMUNERADOS_TOTAL', 'number', 'membros')],
+                             context={'orgao': orgao_name, 'ano': year, 'top': num_companies,
+                                      'metrica': 'TOTAL_REMUNERACAO_ORGAO / NUM_MEMBROS_REMUNERADOS_TOTAL'},
+                             image_base64=image_base64)
+    except Exception as e:
+        plt.close()
+        return {'text': f"ERRO ao gerar o gráfico de Remuneração por Membro: {e}", 'image_base64': None}
+
+def get_remuneration_mix_by_sector(df, orgao_name: str, year: int) -> dict:
+    year = int(year)
+    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta.", 'image_base64': None}
+    mix_cols = ['PCT_REMUNERACAO_FIXA', 'PCT_REMUNERACAO_VARIAVEL', 'PCT_REMUNERACAO_ACOES']
+    if any(col not in df.columns for col in mix_cols) or 'SETOR_DE_ATIVDADE' not in df.columns or \
+       'ORGAO_ADMINISTRACAO' not in df.columns or 'ANO_REFER' not in df.columns:
+        return {'text': "Colunas necessárias (PCT_REMUNERACAO_FIXA, PCT_REMUNERACAO_VARIAVEL, PCT_REMUNERACAO_ACOES, SETOR_DE_ATIVDADE, ORGAO_ADMINISTRACAO, ANO_REFER) não encontradas.", 'image_base64': None}
+    mix = query_engine.aggregate(df, metrics=[{'column': col, 'agg': 'mean'} for col in mix_cols], group_by=['SETOR_DE_ATIVDADE'],
+                                 filters=[{'column': 'ORGAO_ADMINISTRACAO', 'op': 'contains', 'value': orgao_name},
+                                          {'column': 'ANO_REFER', 'op': 'eq', 'value': year}],
+                                 order={'by': 'PCT_REMUNERACAO_VARIAVEL_mean', 'direction': 'desc'})
+    mix = mix.rename(columns={f'{col}_mean': col for col in mix_cols}).dropna(subset=mix_cols, how='all')
+    if mix.empty:
+        return {'text': f"Nenhum dado de composição da remuneração encontrado para o órgão '{orgao_name}' no ano {year}.", 'image_base64': None}
+    try:
+        ax = mix.set_index('SETOR_DE_ATIVDADE')[mix_cols].iloc[::-1].plot(kind='barh', stacked=True, figsize=(12, 8), colormap='viridis')
+        ax.legend(['Fixa', 'Variável', 'Baseada em Ações'], loc='lower right')
+        plt.title(f'Composição Média da Remuneração de {orgao_name} por Setor em {year}')
+        plt.xlabel('Participação Média no Total (%)')
+        plt.ylabel('Setor de Atividade')
+        plt.tight_layout()
+        image_base64 = _render_chart()
+        return _table_result(mix, [_column('SETOR_DE_ATIVDADE', 'string')] + [_column(col, 'number', '%') for col in mix_cols],
+                             context={'orgao': orgao_name, 'ano': year,
+                                      'metrica': 'média por registro da participação de fixa (SALARIO+BENEFICIOS), variável (BONUS+PARTICIPACAO_RESULTADOS) e ações (BASEADA_ACOES)'},
+                             image_base64=image_base64)
+    except Exception as e:
+        plt.close()
+        return {'text': f"ERRO ao gerar o gráfico de Composição da Remuneração: {e}", 'image_base64': None}
+
+def get_remuneration_spread(df, orgao_name: str, year: int, num_companies: int = 10) -> dict:
+    year = int(year)
+    num_companies = int(num_companies)
+    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta."}
+    if 'AMPLITUDE_REMUNERACAO' not in df.columns or 'NOME_COMPANHIA' not in df.columns or \
+       'ORGAO_ADMINISTRACAO' not in df.columns or 'ANO_REFER' not in df.columns:
+        return {'text': "Colunas necessárias (AMPLITUDE_REMUNERACAO, NOME_COMPANHIA, ORGAO_ADMINISTRACAO, ANO_REFER) não encontradas."}
+    spread = query_engine.aggregate(df, metrics=[{'column': 'AMPLITUDE_REMUNERACAO', 'agg': 'max'}, {'column': 'VALOR_MAIOR_REMUNERACAO', 'agg': 'max'},
+                                                 {'column': 'VALOR_MENOR_REMUNERACAO', 'agg': 'min'}],
+                                    group_by=['NOME_COMPANHIA', 'ORGAO_ADMINISTRACAO'],
+                                    filters=[{'column': 'ORGAO_ADMINISTRACAO', 'op': 'contains', 'value': orgao_name},
+                                             {'column': 'ANO_REFER', 'op': 'eq', 'value': year}],
+                                    order={'by': 'AMPLITUDE_REMUNERACAO_max', 'direction': 'desc'})
+    spread = spread.dropna(subset=['AMPLITUDE_REMUNERACAO_max'])
+    if spread.empty:
+        return {'text': f"Nenhum dado de maior/menor remuneração individual encontrado para o órgão '{orgao_name}' no ano {year}."}
+    return _table_result(spread.head(num_companies),
+                         [_column('NOME_COMPANHIA', 'string'), _column('ORGAO_ADMINISTRACAO', 'string'), _column('AMPLITUDE_REMUNERACAO_max', 'number', 'BRL'),
+                          _column('VALOR_MAIOR_REMUNERACAO_max', 'number', 'BRL'), _column('VALOR_MENOR_REMUNERACAO_min', 'number', 'BRL')],
+                         context={'orgao': orgao_name, 'ano': year, 'top': num_companies,
+                                  'metrica': 'VALOR_MAIOR_REMUNERACAO - VALOR_MENOR_REMUNERACAO por empresa e órgão'},
+                         totals={'mediana_amplitude': spread['AMPLITUDE_REMUNERACAO_max'].median(), 'empresas_orgaos': len(spread)})
+
+def aggregate(df, metrics: list, group_by: list = None, filters: list = None, order: dict = None, limit: int = None) -> dict:
+    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta."}
+    limit = query_engine.MAX_AGGREGATE_ROWS if limit is None else min(int(limit), query_engine.MAX_AGGREGATE_ROWS)
+    try:
+        # Sem LIMIT na consulta: o número total de grupos é informado ao modelo antes do corte
+        result = query_engine.aggregate(df, metrics, group_by=group_by, filters=filters, order=order)
+    except query_engine.AggregateSpecError as e:
+        return {'text': f"Consulta inválida: {e}"}
+    if result.empty:
+        return {'text': "Nenhum dado encontrado para os filtros informados."}
+    row_count = len(result)
+    result = result.head(limit)
+    context = {'limite': limit}
+    if not order and group_by and row_count > len(result):
+        context['ordem'] = 'sem ordenação por métrica: linhas em ordem alfabética das colunas de agrupamento'
+    columns = []
+    for col in result.columns:
+        if col in query_engine.DIMENSION_COLUMNS:
+            columns.append(_column(col, 'integer' if col == 'ANO_REFER' else 'string'))
+        else:
+            column, _, agg = col.rpartition('_')
+            unit = 'linhas' if agg == 'count' else NON_MONETARY_COLUMNS.get(column, 'BRL')
+            columns.append(_column(col, 'number', unit))
+    return _table_result(result, columns, context=context, row_count=row_count)
+
+
+TOOL_FUNCTIONS = {func.__name__: func for func in [
+    get_salario_medio_diretoria,
+    get_top_companies_by_salary,
+    get_total_bonus_by_company,
+    get_sector_bonus_range,
+    get_remuneration_trend_by_orgao,
+    get_avg_bonus_effective_by_sector,
+    get_top_sectors_by_avg_total_remuneration,
+    get_remuneration_as_percentage_of_revenue,
+    get_correlation_members_bonus,
+    get_avg_remuneration_by_orgao_segment,
+    get_remuneration_structure_proportion,
+    get_top_bottom_remuneration_values,
+    get_top_remuneration_per_member,
+    get_remuneration_mix_by_sector,
+    get_remuneration_spread,
+    aggregate,
+]}
+
+# O pyplot mantém estado global: as ferramentas (sessões do Streamlit e pré-aquecimento em segundo plano) rodam uma por vez
+_tool_lock = threading.Lock()
+
+
+def run_tool(function_name: str, df, function_args: dict, cache=None, dataset_fingerprint: str = None, record_call: bool = True) -> dict:
+    if function_name not in TOOL_FUNCTIONS:
+        return {'text': f"Erro: Função '{function_name}' não reconhecida ou não implementada."}
+    if record_call:
+        # Uma linha JSON por chamada, no formato de WARMUP_CALLS (ver warmup.most_requested_from_log)
+        logger.info("tool_call %s", json.dumps(caches.canonical_call(function_name, function_args), sort_keys=True, ensure_ascii=False))
+    key = None
+    if cache is not None:
+        key = cache.make_key(function_name, function_args, dataset_fingerprint)
+        if record_call:
+            cache.record_call(key)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    with _tool_lock:
+        tool_output = TOOL_FUNCTIONS[function_name](df, **function_args)
+    # Apenas resultados com dados são cacheados; mensagens de erro/ausência de dados são recalculadas
+    if key is not None and 'columns' in tool_output:
+        cache.put(key, tool_output)
+    return tool_output
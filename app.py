@@ -1,24 +1,21 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import io
 import base64
+import json
+import logging
 import time
+from collections.abc import Mapping
 import streamlit as st # Importar Streamlit
 
+import query_engine
+import analysis_tools
+import caches
+import warmup
+
 # Importar a biblioteca do Google Generative AI
 import google.generativeai as genai
 # Importar tipos específicos (não usados diretamente para construção aqui, mas para referência)
 # from google.generativeai.types import content_types as glm # Não mais necessário se não for usar glm.is_text etc.
 
 
-# --- Configurações para melhor visualização dos gráficos ---
-sns.set_style("whitegrid")
-plt.rcParams['figure.figsize'] = (10, 6)
-plt.rcParams['figure.dpi'] = 100
-plt.rcParams['font.family'] = 'sans-serif'
-plt.rcParams['font.sans-serif'] = ['DejaVu Sans', 'Arial', 'Helvetica', 'sans-serif'] 
-
 # --- Configuração da API do Gemini ---
 # No Streamlit Cloud, adicione sua chave GEMINI_API_KEY aos segredos (ícone de engrenagem -> Secrets)
 try:
@@ -28,24 +25,35 @@ except Exception as e:
     st.error(f"ERRO: Não foi possível configurar a API do Gemini. Certifique-se de que a chave 'GEMINI_API_KEY' está configurada nos segredos do Streamlit. Erro: {e}")
     st.stop()
 
+# Registro de cada chamada de ferramenta (logger analysis_tools) e do progresso do pré-aquecimento (logger warmup)
+# no stderr; a lista de pré-aquecimento pode ser derivada desses logs com `python warmup.py app.log`
+logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s %(message)s")
+logging.getLogger("analysis_tools").setLevel(logging.INFO)
+logging.getLogger("warmup").setLevel(logging.INFO)
+
 # --- Carregamento do CSV Resultante ---
 output_csv_filename = 'dados_cvm_mesclados.csv'
 
+# Backend de consulta: 'pandas' (CSV inteiro em memória, padrão) ou 'duckdb' (leitura sob demanda de arquivos Parquet,
+# para o histórico completo do FRE). Configure QUERY_BACKEND e PARQUET_PATH nos segredos do Streamlit.
+query_backend = st.secrets.get("QUERY_BACKEND", "pandas")
+parquet_path = st.secrets.get("PARQUET_PATH", "dados_cvm/*.parquet")
+source_display = output_csv_filename if query_backend == 'pandas' else parquet_path
+
+# Formato da function_response enviada ao Gemini: 'structured' (linhas tipadas, limitadas) ou 'text' (lista em prosa gerada por render_text, com todas as linhas e o gráfico em base64)
+tool_output_format = st.secrets.get("TOOL_OUTPUT_FORMAT", "structured")
+
 if 'df_resultante' not in st.session_state:
-    st.info(f"Tentando carregar o arquivo CSV: '{output_csv_filename}'...")
+    st.info(f"Tentando carregar os dados: '{source_display}' (backend '{query_backend}')...")
     try:
-        df_resultante = pd.read_csv(
-            output_csv_filename,
-            delimiter=";",
-            encoding="utf-8-sig"
-        )
+        df_resultante = query_engine.load_backend(query_backend, csv_path=output_csv_filename, parquet_path=parquet_path)
         st.session_state['df_resultante'] = df_resultante
-        st.success(f"Arquivo '{output_csv_filename}' carregado com sucesso.")
+        st.success(f"Dados '{source_display}' carregados com sucesso.")
     except FileNotFoundError:
-        st.error(f"ERRO: Arquivo '{output_csv_filename}' não encontrado. Certifique-se de que o nome está correto e que foi incluído no repositório.")
+        st.error(f"ERRO: Arquivo '{source_display}' não encontrado. Certifique-se de que o nome está correto e que foi incluído no repositório.")
         st.stop()
     except Exception as e:
-        st.error(f"ERRO ao carregar o arquivo CSV: {e}")
+        st.error(f"ERRO ao carregar os dados: {e}")
         st.stop()
 else:
     df_resultante = st.session_state['df_resultante']
@@ -54,385 +62,56 @@ if df_resultante.empty:
     st.warning("O DataFrame resultante está vazio. As funções de consulta não poderão operar.")
     st.stop()
 
-# --- 3. Definição das Funções de Consulta (Ferramentas) ---
-# Todas as funções get_... aqui, com as conversões int() e retorno dict.
-
-def get_salario_medio_diretoria(df, year: int) -> dict: 
-    year = int(year) 
-    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta."}
-    if 'SALARIO' not in df.columns or 'ORGAO_ADMINISTRACAO' not in df.columns or 'ANO_REFER' not in df.columns:
-        return {'text': "Colunas necessárias (SALARIO, ORGAO_ADMINISTRACAO, ANO_REFER) não encontradas."}
-    filtered_df = df[(df['ORGAO_ADMINISTRACAO'].str.contains('DIRETORIA', na=False, case=False)) &
-                     (df['ANO_REFER'] == year)]
-    if filtered_df.empty:
-        return {'text': f"Nenhum dado encontrado para 'DIRETORIA' no ano {year}."}
-    mean_salary = filtered_df['SALARIO'].mean()
-    return {'text': f"O salário médio para membros da DIRETORIA em {year} é R$ {mean_salary:,.2f}."}
-
-def get_top_companies_by_salary(df, num_companies: int, year: int = None) -> dict:
-    num_companies = int(num_companies)
-    if year is not None:
-        year = int(year)
-    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta.", 'image_base64': None}
-    if 'SALARIO' not in df.columns or 'NOME_COMPANHIA' not in df.columns or 'ANO_REFER' not in df.columns:
-        return {'text': "Colunas necessárias (SALARIO, NOME_COMPANHIA, ANO_REFER) não encontradas.", 'image_base64': None}
-    df_filtered = df.copy()
-    if year is None:
-        last_year = df_filtered['ANO_REFER'].max()
-        df_filtered = df_filtered[df_filtered['ANO_REFER'] == last_year]
-        year_display = last_year
-    else:
-        df_filtered = df_filtered[df_filtered['ANO_REFER'] == year]
-        year_display = year
-    if df_filtered.empty:
-        return {'text': f"Nenhum dado encontrado para o ano {year_display}.", 'image_base64': None}
-    top_companies = df_filtered.groupby('NOME_COMPANHIA')['SALARIO'].sum().nlargest(num_companies).reset_index()
-    if top_companies.empty:
-        return {'text': f"Nenhuma empresa encontrada com dados de salário para o ano {year_display}.", 'image_base64': None}
-    try:
-        plt.figure(figsize=(12, 7))
-        sns.barplot(x='SALARIO', y='NOME_COMPANHIA', data=top_companies, palette='viridis', hue='NOME_COMPANHIA', legend=False)
-        plt.title(f'Top {num_companies} Empresas por Salário Total em {year_display}')
-        plt.xlabel('Salário Total (R$)')
-        plt.ylabel('Nome da Companhia')
-        plt.ticklabel_format(style='plain', axis='x')
-        plt.tight_layout()
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        image_base64 = base64.b64encode(buf.read()).decode('utf-8')
-        plt.close()
-        result_text = f"As top {num_companies} empresas com maior salário total em {year_display} são:\n"
-        for index, row in top_companies.iterrows():
-            result_text += f"- {row['NOME_COMPANHIA']}: R$ {row['SALARIO']:,.2f}\n"
-        return {'text': result_text, 'image_base64': image_base64}
-    except Exception as e:
-        plt.close()
-        return {'text': f"ERRO ao gerar o gráfico de Top Empresas por Salário: {e}", 'image_base64': None}
-
-def get_total_bonus_by_company(df, company_name: str, year: int, exact_match: bool = False) -> dict:
-    year = int(year)
-    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta."}
-    if 'BONUS' not in df.columns or 'NOME_COMPANHIA' not in df.columns or 'ANO_REFER' not in df.columns:
-        return {'text': "Colunas necessárias (BONUS, NOME_COMPANHIA, ANO_REFER) não encontradas."}
-    if exact_match:
-        filtered_df = df[(df['NOME_COMPANHIA'] == company_name) &
-                         (df['ANO_REFER'] == year)]
-    else:
-        filtered_df = df[(df['NOME_COMPANHIA'].str.contains(company_name, na=False, case=False)) &
-                         (df['ANO_REFER'] == year)]
-    if filtered_df.empty:
-        return {'text': f"Nenhum dado de bônus encontrado para '{company_name}' (busca {'exata' if exact_match else 'parcial'}) no ano {year}. Verifique o nome da empresa ou o ano."}
-    total_bonus = filtered_df['BONUS'].sum()
-    return {'text': f"O valor total de bônus pago por '{company_name}' em {year} foi de R$ {total_bonus:,.2f}."}
-
-def get_sector_bonus_range(df, sector_name: str, year: int) -> dict:
-    year = int(year)
-    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta."}
-    if 'BONUS_VALOR_EFETIVO' not in df.columns and 'BONUS' not in df.columns:
-        return {'text': "Nenhuma coluna de bônus (BONUS_VALOR_EFETIVO ou BONUS) encontrada para análise."}
-    if 'SETOR_DE_ATIVDADE' not in df.columns or 'ANO_REFER' not in df.columns:
-        return {'text': "Colunas necessárias (SETOR_DE_ATIVDADE, ANO_REFER) não encontradas."}
-    bonus_col = 'BONUS_VALOR_EFETIVO' if 'BONUS_VALOR_EFETIVO' in df.columns else 'BONUS'
-    if bonus_col not in df.columns:
-           return {'text': f"Coluna de bônus '{bonus_col}' não encontrada."}
-    filtered_df = df[(df['SETOR_DE_ATIVDADE'].str.contains(sector_name, na=False, case=False)) &
-                     (df['ANO_REFER'] == year)].copy()
-    if filtered_df.empty:
-        return {'text': f"Nenhum dado de bônus encontrado para o setor '{sector_name}' no ano {year}."}
-    min_bonus = filtered_df[bonus_col].min()
-    max_bonus = filtered_df[bonus_col].max()
-    mean_bonus = filtered_df[bonus_col].mean()
-    return {'text': (f"Para o setor '{sector_name}' em {year}:\n"
-                     f"   Bônus Mínimo: R$ {min_bonus:,.2f}\n"
-                     f"   Bônus Máximo: R$ {max_bonus:,.2f}\n"
-                     f"   Bônus Médio: R$ {mean_bonus:,.2f}")}
-
-def get_remuneration_trend_by_orgao(df, orgao: str, start_year: int, end_year: int) -> dict:
-    start_year = int(start_year)
-    end_year = int(end_year)
-    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta.", 'image_base64': None}
-    if 'VALOR_MEDIO_REMUNERACAO' not in df.columns and 'TOTAL_REMUNERACAO_ORGAO' not in df.columns:
-        return {'text': "Nenhuma coluna de remuneração (VALOR_MEDIO_REMUNERACAO ou TOTAL_REMUNERACAO_ORGAO) encontrada para análise de tendência.", 'image_base64': None}
-    if 'ORGAO_ADMINISTRACAO' not in df.columns or 'ANO_REFER' not in df.columns:
-        return {'text': "Colunas necessárias (ORGAO_ADMINISTRACAO, ANO_REFER) não encontradas."}
-    remuneration_col = 'VALOR_MEDIO_REMUNERACAO' if 'VALOR_MEDIO_REMUNERACAO' in df.columns else 'TOTAL_REMUNERACAO_ORGAO'
-    if remuneration_col not in df.columns:
-        return {'text': f"Coluna de remuneração '{remuneration_col}' não encontrada.", 'image_base64': None}
-    filtered_df = df[(df['ORGAO_ADMINISTRACAO'].str.contains(orgao, na=False, case=False)) &
-                     (df['ANO_REFER'] >= start_year) &
-                     (df['ANO_REFER'] <= end_year)].copy()
-    if filtered_df.empty:
-        return {'text': f"Nenhum dado encontrado para o órgão '{orgao}' entre os anos {start_year} e {end_year}.", 'image_base64': None}
-    trend_data = filtered_df.groupby('ANO_REFER')[remuneration_col].mean().reset_index()
-    trend_data = trend_data.sort_values('ANO_REFER')
-    if trend_data.empty:
-        return {'text': f"Não foi possível calcular a tendência para o órgão '{orgao}' entre {start_year} e {end_year} (dados insuficientes).", 'image_base64': None}
-    try:
-        plt.figure(figsize=(12, 7))
-        sns.lineplot(x='ANO_REFER', y=remuneration_col, data=trend_data, marker='o')
-        plt.title(f'Tendência da Remuneração Média de {orgao} ({start_year}-{end_year})')
-        plt.xlabel('Ano de Referência')
-        plt.ylabel(f'Remuneração Média ({remuneration_col}) (R$)')
-        plt.ticklabel_format(style='plain', axis='y')
-        plt.xticks(trend_data['ANO_REFER'])
-        plt.tight_layout()
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        image_base64 = base64.b64encode(buf.read()).decode('utf-8')
-        plt.close()
-        result_text = f"Tendência da remuneração média para o órgão '{orgao}' entre {start_year} e {end_year}:\n"
-        for index, row in trend_data.iterrows():
-            result_text += f"- Ano {int(row['ANO_REFER'])}: R$ {row[remuneration_col]:,.2f}\n"
-        return {'text': result_text, 'image_base64': image_base64}
-    except Exception as e:
-        plt.close()
-        return {'text': f"ERRO ao gerar o gráfico de Tendência de Remuneração: {e}", 'image_base64': None}
-
-def get_avg_bonus_effective_by_sector(df, sector_name: str, year: int) -> dict:
-    year = int(year)
-    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta."}
-    if 'BONUS_VALOR_EFETIVO' not in df.columns and 'BONUS' not in df.columns:
-        return {'text': "Nenhuma coluna de bônus (BONUS_VALOR_EFETIVO ou BONUS) encontrada para análise."}
-    if 'SETOR_DE_ATIVDADE' not in df.columns or 'ANO_REFER' not in df.columns:
-        return {'text': "Colunas necessárias (SETOR_DE_ATIVDADE, ANO_REFER) não encontradas."}
-    bonus_col = 'BONUS_VALOR_EFETIVO' if 'BONUS_VALOR_EFETIVO' in df.columns else 'BONUS'
-    if bonus_col not in df.columns:
-           return {'text': f"Coluna de bônus '{bonus_col}' não encontrada."}
-    filtered_df = df[(df['SETOR_DE_ATIVDADE'].str.contains(sector_name, na=False, case=False)) &
-                     (df['ANO_REFER'] == year)].copy()
-    if filtered_df.empty:
-        return {'text': f"Nenhum dado de bônus efetivo encontrado para o setor '{sector_name}' no ano {year}."}
-    avg_bonus_effective = filtered_df[bonus_col].mean()
-    return {'text': f"O valor médio do bônus efetivo para o setor '{sector_name}' em {year} é R$ {avg_bonus_effective:,.2f}."}
-
-def get_top_sectors_by_avg_total_remuneration(df, num_sectors: int, year: int) -> dict:
-    num_sectors = int(num_sectors)
-    year = int(year)
-    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta.", 'image_base64': None}
-    if 'TOTAL_REMUNERACAO_ORGAO' not in df.columns or 'SETOR_DE_ATIVDADE' not in df.columns or 'ANO_REFER' not in df.columns:
-        return {'text': "Colunas necessárias (TOTAL_REMUNERACAO_ORGAO, SETOR_DE_ATIVDADE, ANO_REFER) não encontradas.", 'image_base64': None}
-    filtered_df = df[df['ANO_REFER'] == year].copy()
-    if filtered_df.empty:
-        return {'text': f"Nenhum dado encontrado para o ano {year}.", 'image_base64': None}
-    avg_remuneration_by_sector = filtered_df.groupby('SETOR_DE_ATIVDADE')['TOTAL_REMUNERACAO_ORGAO'].mean().nlargest(num_sectors).reset_index()
-    if avg_remuneration_by_sector.empty:
-        return {'text': f"Nenhum setor encontrado com remuneração média total para o ano {year}.", 'image_base64': None}
-    try:
-        plt.figure(figsize=(12, 7))
-        sns.barplot(x='TOTAL_REMUNERACAO_ORGAO', y='SETOR_DE_ATIVDADE', data=avg_remuneration_by_sector, palette='magma', hue='SETOR_DE_ATIVDADE', legend=False)
-        plt.title(f'Top {num_sectors} Setores por Remuneração Média Total em {year}')
-        plt.xlabel('Remuneração Média Total (R$)')
-        plt.ylabel('Setor de Atividade')
-        plt.ticklabel_format(style='plain', axis='x')
-        plt.tight_layout()
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        image_base64 = base64.b64encode(buf.read()).decode('utf-8')
-        plt.close()
-        result_text = f"Os top {num_sectors} setores com a maior remuneração média total em {year} são:\n"
-        for index, row in avg_remuneration_by_sector.iterrows():
-            result_text += f"- {row['SETOR_DE_ATIVDADE']}: R$ {row['TOTAL_REMUNERACAO_ORGAO']:,.2f}\n"
-        return {'text': result_text, 'image_base64': image_base64}
-    except Exception as e:
-        plt.close()
-        return {'text': f"ERRO ao gerar o gráfico de Top Setores por Remuneração: {e}", 'image_base64': None}
-
-def get_remuneration_as_percentage_of_revenue(df, num_companies: int, sector_name: str, year: int) -> dict:
-    num_companies = int(num_companies)
-    year = int(year)
-    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta."}
-    if 'TOTAL_REMUNERACAO_ORGAO' not in df.columns or 'RECEITA' not in df.columns or \
-       'SETOR_DE_ATIVDADE' not in df.columns or 'ANO_REFER' not in df.columns or \
-       'NOME_COMPANHIA' not in df.columns:
-        return {'text': "Colunas necessárias (TOTAL_REMUNERACAO_ORGAO, RECEITA, SETOR_DE_ATIVDADE, ANO_REFER, NOME_COMPANHIA) não encontradas."}
-    filtered_df = df[(df['SETOR_DE_ATIVDADE'].str.contains(sector_name, na=False, case=False)) &
-                     (df['ANO_REFER'] == year)].copy()
-    if filtered_df.empty:
-        return {'text': f"Nenhum dado encontrado para o setor '{sector_name}' no ano {year}."}
-    company_data = filtered_df.groupby('NOME_COMPANHIA').agg(
-        Total_Remuneracao=('TOTAL_REMUNERACAO_ORGAO', 'sum'),
-        Receita=('RECEITA', 'sum')
-    ).reset_index()
-    company_data = company_data[company_data['Receita'].fillna(0) > 0]
-    if company_data.empty:
-        return {'text': f"Nenhuma empresa com receita válida encontrada para o setor '{sector_name}' no ano {year}."}
-    company_data['Remuneracao_Percentual_Receita'] = (company_data['Total_Remuneracao'] / company_data['Receita']) * 100
-    top_companies = company_data.nlargest(num_companies, 'Receita')
-    top_companies = top_companies.sort_values(by='Remuneracao_Percentual_Receita', ascending=False)
-    result_text = f"Remuneração Total como Percentual da Receita para as top {num_companies} empresas do setor '{sector_name}' em {year} (ordenado por %):\n"
-    for index, row in top_companies.iterrows():
-        result_text += (f"- {row['NOME_COMPANHIA']}: Receita R$ {row['RECEITA']:,.2f}, "
-                        f"Remuneração Total R$ {row['Total_Remuneracao']:,.2f}, "
-                        f"Percentual: {row['Remuneracao_Percentual_Receita']:,.2f}%\n")
-    return {'text': result_text}
-
-def get_correlation_members_bonus(df, year: int) -> dict:
-    year = int(year)
-    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta.", 'image_base64': None}
-    if 'NUM_MEMBROS_REMUNERADOS_TOTAL' not in df.columns or 'BONUS' not in df.columns or \
-       'NOME_COMPANHIA' not in df.columns or 'ANO_REFER' not in df.columns:
-        return {'text': "Colunas necessárias (NUM_MEMBROS_REMUNERADOS_TOTAL, BONUS, NOME_COMPANHIA, ANO_REFER) não encontradas."}
-    filtered_df = df[df['ANO_REFER'] == year].copy()
-    if filtered_df.empty:
-        return {'text': f"Nenhum dado encontrado para o ano {year}.", 'image_base64': None}
-    company_aggregated = filtered_df.groupby('NOME_COMPANHIA').agg(
-        Total_Membros_Remunerados=('NUM_MEMBROS_REMUNERADOS_TOTAL', 'sum'),
-        Total_Bonus=('BONUS', 'sum')
-    ).reset_index()
-    company_aggregated = company_aggregated.dropna(subset=['Total_Membros_Remunerados', 'Total_Bonus'])
-    company_aggregated = company_aggregated[(company_aggregated['Total_Membros_Remunerados'] > 0) &
-                                            (company_aggregated['Total_Bonus'] > 0)]
-    if company_aggregated.empty:
-        return {'text': f"Dados insuficientes para calcular a correlação entre membros remunerados e bônus para o ano {year}.", 'image_base64': None}
-    correlation = company_aggregated['Total_Membros_Remunerados'].corr(company_aggregated['Total_Bonus'])
-    try:
-        plt.figure(figsize=(12, 7))
-        sns.scatterplot(x='Total_Membros_Remunerados', y='Total_Bonus', data=company_aggregated, hue='NOME_COMPANHIA', legend='brief', s=100)
-        plt.title(f'Correlação entre Membros Remunerados e Bônus Total por Empresa em {year}\nCorrelação: {correlation:,.2f}')
-        plt.xlabel('Número Total de Membros Remunerados')
-        plt.ylabel('Bônus Total (R$)')
-        plt.ticklabel_format(style='plain', axis='y')
-        plt.tight_layout()
-        if len(company_aggregated['NOME_COMPANHIA'].unique()) > 10:
-            plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left', borderaxespad=0.)
-        else:
-            plt.legend(loc='best')
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        image_base64 = base64.b64encode(buf.read()).decode('utf-8')
-        plt.close()
-        result_text = (f"A correlação entre o número total de membros remunerados e o bônus total pago por empresa em {year} é de {correlation:,.2f}.\n"
-                       f"Um valor próximo de 1 indica uma correlação positiva forte, -1 uma correlação negativa forte, e 0 nenhuma correlação.\n")
-        return {'text': result_text, 'image_base64': image_base64}
-    except Exception as e:
-        plt.close()
-        return {'text': f"ERRO ao gerar o gráfico de Correlação: {e}", 'image_base64': None}
-
-def get_avg_remuneration_by_orgao_segment(df, orgao_name: str, year: int) -> dict:
-    year = int(year)
-    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta.", 'image_base64': None}
-    if 'TOTAL_REMUNERACAO_ORGAO' not in df.columns or 'ORGAO_ADMINISTRACAO' not in df.columns or \
-       'SETOR_DE_ATIVDADE' not in df.columns or 'ANO_REFER' not in df.columns:
-        return {'text': "Colunas necessárias (TOTAL_REMUNERACAO_ORGAO, ORGAO_ADMINISTRACAO, SETOR_DE_ATIVDADE, ANO_REFER) não encontradas."}
-    filtered_df = df[(df['ORGAO_ADMINISTRACAO'].str.contains(orgao_name, na=False, case=False)) &
-                     (df['ANO_REFER'] == year)].copy()
-    if filtered_df.empty:
-        return {'text': f"Nenhum dado encontrado para o órgão '{orgao_name}' no ano {year}.", 'image_base64': None}
-    remuneration_by_segment = filtered_df.groupby('SETOR_DE_ATIVDADE')['TOTAL_REMUNERACAO_ORGAO'].mean().reset_index()
-    remuneration_by_segment = remuneration_by_segment.sort_values(by='TOTAL_REMUNERACAO_ORGAO', ascending=False)
-    if remuneration_by_segment.empty:
-        return {'text': f"Nenhum dado de remuneração média por segmento encontrado para o órgão '{orgao_name}' no ano {year}.", 'image_base64': None}
+# No pandas os dados ficam fixos na sessão; no DuckDB os arquivos Parquet são relidos a cada consulta, então a
+# impressão digital (apenas metadados dos arquivos) é recalculada a cada execução para acompanhar atualizações
+if 'dataset_fingerprint' not in st.session_state or isinstance(df_resultante, query_engine.DuckDBBackend):
+    st.session_state['dataset_fingerprint'] = query_engine.dataset_fingerprint(df_resultante)
+
+# --- Cache de respostas ---
+# Compartilhado por todas as sessões do processo: a primeira pergunta de uma conversa, se já respondida
+# (mesma pergunta normalizada e mesmo dataset), é servida sem chamar o Gemini nem executar ferramentas.
+@st.cache_resource
+def get_answer_cache():
+    return caches.AnswerCache(max_entries=int(st.secrets.get("ANSWER_CACHE_MAX_ENTRIES", 256)),
+                                    ttl_seconds=float(st.secrets.get("ANSWER_CACHE_TTL_SECONDS", 24 * 3600)))
+
+# --- Cache de resultados das ferramentas e pré-aquecimento ---
+# Resultados das ferramentas (dados + gráfico) compartilhados entre sessões. Após carregar um dataset, uma thread
+# em segundo plano pré-calcula as análises mais comuns (WARMUP_CALLS nos segredos, ou a lista padrão).
+@st.cache_resource
+def get_tool_result_cache():
+    return caches.ToolResultCache(max_entries=int(st.secrets.get("TOOL_CACHE_MAX_ENTRIES", 512)),
+                                  ttl_seconds=float(st.secrets.get("TOOL_CACHE_TTL_SECONDS", 24 * 3600)))
+
+def load_warmup_calls():
+    # WARMUP_CALLS: lista de {"tool": ..., "args": {...}} (JSON ou lista TOML). Um valor inválido não impede o app
+    # de subir: exibe um aviso e usa a lista padrão.
+    calls = st.secrets.get("WARMUP_CALLS")
+    if calls is None:
+        return None
     try:
-        plt.figure(figsize=(12, 7))
-        sns.barplot(x='TOTAL_REMUNERACAO_ORGAO', y='SETOR_DE_ATIVDADE', data=remuneration_by_segment, palette='crest', hue='SETOR_DE_ATIVDADE', legend=False)
-        plt.title(f'Remuneração Média Total de {orgao_name} por Setor de Atividade em {year}')
-        plt.xlabel('Remuneração Média Total (R$)')
-        plt.ylabel('Setor de Atividade')
-        plt.ticklabel_format(style='plain', axis='x')
-        plt.tight_layout()
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        image_base64 = base64.b64encode(buf.read()).decode('utf-8')
-        plt.close()
-        result_text = f"Média da remuneração total para '{orgao_name}' por Setor de Atividade em {year}:\n"
-        for index, row in remuneration_by_segment.iterrows():
-            result_text += f"- {row['SETOR_DE_ATIVDADE']}: R$ {row['TOTAL_REMUNERACAO_ORGAO']:,.2f}\n"
-        return {'text': result_text, 'image_base64': image_base64}
-    except Exception as e:
-        plt.close()
-        return {'text': f"ERRO ao gerar o gráfico de Remuneração Média por Órgão e Segmento: {e}", 'image_base64': None}
-
-def get_remuneration_structure_proportion(df, orgao_name: str, year: int) -> dict:
-    year = int(year)
-    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta.", 'image_base64': None}
-    relevant_cols = ['SALARIO', 'BONUS', 'PARTICIPACAO_RESULTADOS', 'PRECO_MEDIO_PONDERADO_OPCOES_EM_ABERTO', 'VL_ACOES_RESTRITAS']
-    for col in relevant_cols:
-        if col not in df.columns:
-            return {'text': f"Coluna '{col}' necessária para inferir a estrutura de remuneração não encontrada.", 'image_base64': None}
-    if 'ORGAO_ADMINISTRACAO' not in df.columns or 'ANO_REFER' not in df.columns:
-        return {'text': "Colunas necessárias (ORGAO_ADMINISTRACAO, ANO_REFER) não encontradas."}
-    filtered_df = df[(df['ORGAO_ADMINISTRACAO'].str.contains(orgao_name, na=False, case=False)) &
-                     (df['ANO_REFER'] == year)].copy()
-    if filtered_df.empty:
-        return {'text': f"Nenhum dado encontrado para o órgão '{orgao_name}' no ano {year}.", 'image_base64': None}
-    def classify_remuneration_structure(row):
-        has_fixa = pd.notna(row['SALARIO']) and row['SALARIO'] > 0
-        has_variavel = (pd.notna(row['BONUS']) and row['BONUS'] > 0) or \
-                       (pd.notna(row['PARTICIPACAO_RESULTADOS']) and row['PARTICIPACAO_RESULTADOS'] > 0)
-        has_acoes = (pd.notna(row['PRECO_MEDIO_PONDERADO_OPCOES_EM_ABERTO']) and row['PRECO_MEDIO_PONDERADO_OPCOES_EM_ABERTO'] > 0) or \
-                    (pd.notna(row['VL_ACOES_RESTRITAS']) and row['VL_ACOES_RESTRITAS'] > 0)
-        if has_fixa and has_variavel and has_acoes:
-            return "Fixa, Variável e Ações"
-        elif has_fixa and has_variavel:
-            return "Fixa e Variável"
-        elif has_fixa and has_acoes:
-            return "Fixa e Ações"
-        elif has_fixa:
-            return "Somente Fixa"
-        else:
-            return "Outra/Não Classificada"
-    filtered_df['Estrutura_Remuneracao'] = filtered_df.apply(classify_remuneration_structure, axis=1)
-    structure_counts = filtered_df['Estrutura_Remuneracao'].value_counts(normalize=True).reset_index()
-    structure_counts.columns = ['Estrutura', 'Proporcao']
-    structure_counts['Proporcao'] = structure_counts['Proporcao'] * 100
-    if structure_counts.empty:
-        return {'text': f"Nenhuma estrutura de remuneração classificada para o órgão '{orgao_name}' no ano {year}.", 'image_base64': None}
-    try:
-        plt.figure(figsize=(10, 8))
-        sns.barplot(x='Proporcao', y='Estrutura', data=structure_counts, palette='pastel', hue='Estrutura', legend=False)
-        plt.title(f'Estruturas de Remuneração para {orgao_name} em {year} (% de Ocorrências)')
-        plt.xlabel('Proporção (%)')
-        plt.ylabel('Estrutura de Remuneração')
-        plt.tight_layout()
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        image_base64 = base64.b64encode(buf.read()).decode('utf-8')
-        plt.close()
-        result_text = f"Proporção das estruturas de remuneração para '{orgao_name}' em {year}:\n"
-        for index, row in structure_counts.iterrows():
-            result_text += f"- {row['Estrutura']}: {row['Proporcao']:,.2f}%\n"
-        return {'text': result_text, 'image_base64': image_base64}
-    except Exception as e:
-        plt.close()
-        return {'text': f"ERRO ao gerar o gráfico de Estruturas de Remuneração: {e}", 'image_base64': None}
-
-def get_top_bottom_remuneration_values(df, orgao_name: str, year: int, num_companies: int = 5) -> dict:
-    year = int(year)
-    num_companies = int(num_companies)
-    if df.empty: return {'text': "DataFrame vazio. Não foi possível realizar a consulta."}
-    if 'TOTAL_REMUNERACAO_ORGAO' not in df.columns or 'NOME_COMPANHIA' not in df.columns or \
-       'ORGAO_ADMINISTRACAO' not in df.columns or 'ANO_REFER' not in df.columns:
-        return {'text': "Colunas necessárias (TOTAL_REMUNERACAO_ORGAO, NOME_COMPANHIA, ORGAO_ADMINISTRACAO, ANO_REFER) não encontradas."}
-    filtered_df = df[(df['ORGAO_ADMINISTRACAO'].str.contains(orgao_name, na=False, case=False)) &
-                     (df['ANO_REFER'] == year)].copy()
-    if filtered_df.empty:
-        return {'text': f"Nenhum dado encontrado para o órgão '{orgao_name}' no ano {year}."}
-    unique_remuneration = filtered_df.groupby(['NOME_COMPANHIA', 'ORGAO_ADMINISTRACAO', 'ANO_REFER'])['TOTAL_REMUNERACAO_ORGAO'].sum().reset_index()
-    if unique_remuneration.empty:
-        return {'text': f"Nenhum dado de remuneração total único encontrado para o órgão '{orgao_name}' no ano {year}."}
-    top_values = unique_remuneration.nlargest(num_companies, 'TOTAL_REMUNERACAO_ORGAO')
-    bottom_values = unique_remuneration[unique_remuneration['TOTAL_REMUNERACAO_ORGAO'] > 0].nsmallest(num_companies, 'TOTAL_REMUNERACAO_ORGAO')
-    result_text = f"Maiores e Menores {num_companies} Remunerações Totais para '{orgao_name}' em {year}:\n\n"
-    result_text += "--- Maiores Remunerações ---\n"
-    if not top_values.empty:
-        for index, row in top_values.iterrows():
-            result_text += f"- {row['NOME_COMPANHIA']}: R$ {row['TOTAL_REMUNERACAO_ORGAO']:,.2f}\n"
-    else:
-        result_text += "Nenhum dado de maiores remunerações.\n"
-    result_text += "\n--- Menores Remunerações (excluindo zeros/nulos) ---\n"
-    if not bottom_values.empty:
-        for index, row in bottom_values.iterrows():
-            result_text += f"- {row['NOME_COMPANHIA']}: R$ {row['TOTAL_REMUNERACAO_ORGAO']:,.2f}\n"
-    else:
-        result_text += "Nenhum dado de menores remunerações.\n"
-    return {'text': result_text}
-
+        if isinstance(calls, str):
+            calls = json.loads(calls)
+        calls = [dict(call) for call in calls]
+        for call in calls:
+            if not isinstance(call.get('tool'), str) or not isinstance(call.setdefault('args', {}), Mapping):
+                raise ValueError(f"entrada inválida: {call}")
+            call['args'] = dict(call['args'])
+    except (TypeError, ValueError) as e:
+        st.warning(f"WARMUP_CALLS inválido nos segredos ({e}); usando a lista padrão de pré-aquecimento.")
+        return None
+    return calls
+
+@st.cache_resource
+def get_warmup_job(_df, dataset_fingerprint: str, _calls=None):
+    # Um job por dataset: uma atualização dos dados (nova impressão digital) dispara um novo pré-aquecimento
+    calls = _calls if _calls is not None else warmup.default_warmup_calls(_df)
+    return warmup.WarmupJob(_df, calls, get_tool_result_cache(), dataset_fingerprint).start()
+
+if st.secrets.get("WARMUP_ENABLED", True):
+    warmup_job = get_warmup_job(df_resultante, st.session_state['dataset_fingerprint'], load_warmup_calls())
+else:
+    warmup_job = None
 
 # --- 4. Definição das Ferramentas (Tool Specifications) para o Gemini ---
 # Definindo as ferramentas usando dicionários Python simples para maior robustez
@@ -539,7 +218,7 @@ tools = [
     },
     {
         "name": 'get_correlation_members_bonus',
-        "description": 'Analisa a correlação entre o número de membros remunerados e o bônus total para um ano específico, gerando um gráfico de dispersão. Use para entender a relação entre o tamanho da equipe remunerada e o total de bônus.',
+        "description": 'Analisa a correlação entre o número de membros remunerados e o bônus total (e o bônus por membro, bônus total da empresa dividido pelos membros remunerados) para um ano específico, gerando um gráfico de dispersão. Use para entender a relação entre o tamanho da equipe remunerada e o total de bônus.',
         "parameters": {
             "type": "OBJECT",
             "properties": {
@@ -562,7 +241,7 @@ tools = [
     },
     {
         "name": 'get_remuneration_structure_proportion',
-        "description": 'Calcula a proporção de empresas que utilizam diferentes estruturas de remuneração para um órgão em um ano. Use para entender como as empresas remuneram seus membros.',
+        "description": 'Calcula a proporção de empresas que utilizam diferentes estruturas de remuneração (fixa, variável, baseada em ações) para um órgão em um ano. Use para entender como as empresas remuneram seus membros.',
         "parameters": {
             "type": "OBJECT",
             "properties": {
@@ -585,6 +264,94 @@ tools = [
             "required": ['orgao_name', 'year'],
         },
     },
+    {
+        "name": 'get_top_remuneration_per_member',
+        "description": 'Lista as N empresas com a maior remuneração total por membro (TOTAL_REMUNERACAO_ORGAO / NUM_MEMBROS_REMUNERADOS_TOTAL) para um órgão em um ano (uma linha por empresa e órgão) e gera um gráfico de barras. Use para comparar quanto cada membro recebe, independentemente do tamanho do órgão.',
+        "parameters": {
+            "type": "OBJECT",
+            "properties": {
+                'orgao_name': {"type": "STRING", "description": 'O nome do órgão de administração, ex: "DIRETORIA", "CONSELHO DE ADMINISTRACAO"'},
+                'year': {"type": "INTEGER", "description": 'O ano de referência, ex: 2025'},
+                'num_companies': {"type": "INTEGER", "description": 'O número de empresas a serem listadas. Default é 10.'},
+            },
+            "required": ['orgao_name', 'year'],
+        },
+    },
+    {
+        "name": 'get_remuneration_mix_by_sector',
+        "description": 'Calcula, por setor de atividade, a composição média da remuneração de um órgão em um ano: % fixa (SALARIO + BENEFICIOS), % variável (BONUS + PARTICIPACAO_RESULTADOS) e % baseada em ações, com gráfico de barras empilhadas. Use para comparar o mix de remuneração entre setores.',
+        "parameters": {
+            "type": "OBJECT",
+            "properties": {
+                'orgao_name': {"type": "STRING", "description": 'O nome do órgão de administração, ex: "DIRETORIA", "CONSELHO DE ADMINISTRACAO"'},
+                'year': {"type": "INTEGER", "description": 'O ano de referência, ex: 2025'},
+            },
+            "required": ['orgao_name', 'year'],
+        },
+    },
+    {
+        "name": 'get_remuneration_spread',
+        "description": 'Lista as N empresas com a maior diferença entre a maior e a menor remuneração individual (VALOR_MAIOR_REMUNERACAO - VALOR_MENOR_REMUNERACAO) de um órgão em um ano (uma linha por empresa e órgão). Use para analisar a desigualdade de remuneração dentro dos órgãos.',
+        "parameters": {
+            "type": "OBJECT",
+            "properties": {
+                'orgao_name': {"type": "STRING", "description": 'O nome do órgão de administração, ex: "DIRETORIA", "CONSELHO FISCAL"'},
+                'year': {"type": "INTEGER", "description": 'O ano de referência, ex: 2025'},
+                'num_companies': {"type": "INTEGER", "description": 'O número de empresas a serem listadas. Default é 10.'},
+            },
+            "required": ['orgao_name', 'year'],
+        },
+    },
+    {
+        "name": 'aggregate',
+        "description": 'Consulta agregada genérica: calcula uma ou mais métricas (soma, média, mediana, mínimo, máximo, contagem) sobre colunas numéricas, agrupando por dimensões e aplicando filtros, ordenação e limite em uma única chamada. Use quando a pergunta combinar várias métricas, agrupamentos ou filtros que as outras ferramentas não cobrem, ex: "média de BONUS e SALARIO por setor para a Diretoria de 2022 a 2024, top 5".',
+        "parameters": {
+            "type": "OBJECT",
+            "properties": {
+                'metrics': {
+                    "type": "ARRAY",
+                    "description": 'Lista de métricas a calcular.',
+                    "items": {
+                        "type": "OBJECT",
+                        "properties": {
+                            'column': {"type": "STRING", "description": 'Coluna numérica, ex: "SALARIO", "BONUS", "TOTAL_REMUNERACAO_ORGAO", "NUM_MEMBROS_REMUNERADOS_TOTAL", ou derivada: "REMUNERACAO_POR_MEMBRO", "BONUS_POR_MEMBRO", "REMUNERACAO_FIXA", "REMUNERACAO_VARIAVEL", "REMUNERACAO_ACOES", "PCT_REMUNERACAO_FIXA", "PCT_REMUNERACAO_VARIAVEL", "PCT_REMUNERACAO_ACOES", "AMPLITUDE_REMUNERACAO"'},
+                            'agg': {"type": "STRING", "description": 'Agregação: "sum", "mean", "median", "min", "max" ou "count"'},
+                        },
+                        "required": ['column', 'agg'],
+                    },
+                },
+                'group_by': {
+                    "type": "ARRAY",
+                    "description": 'Colunas de agrupamento: "NOME_COMPANHIA", "CNPJ_COMPANHIA", "ORGAO_ADMINISTRACAO", "SETOR_DE_ATIVDADE", "ANO_REFER", "ESTRUTURA_REMUNERACAO". Omita para um total geral.',
+                    "items": {"type": "STRING"},
+                },
+                'filters': {
+                    "type": "ARRAY",
+                    "description": 'Filtros aplicados antes da agregação (combinados com E).',
+                    "items": {
+                        "type": "OBJECT",
+                        "properties": {
+                            'column': {"type": "STRING", "description": 'Coluna a filtrar, ex: "ANO_REFER", "ORGAO_ADMINISTRACAO"'},
+                            'op': {"type": "STRING", "description": 'Operador: "eq", "ne", "gt", "gte", "lt", "lte", "between", "in" ou "contains" (texto parcial, sem diferenciar maiúsculas)'},
+                            'value': {"type": "STRING", "description": 'Valor para operadores de um único valor, ex: "2024", "Diretoria"'},
+                            'values': {"type": "ARRAY", "description": 'Valores para "between" (início e fim) ou "in"', "items": {"type": "STRING"}},
+                        },
+                        "required": ['column', 'op'],
+                    },
+                },
+                'order': {
+                    "type": "OBJECT",
+                    "description": 'Ordenação do resultado.',
+                    "properties": {
+                        'by': {"type": "STRING", "description": 'Métrica no formato COLUNA_agg (ex: "BONUS_mean") ou coluna de agrupamento'},
+                        'direction': {"type": "STRING", "description": '"asc" ou "desc" (default)'},
+                    },
+                },
+                'limit': {"type": "INTEGER", "description": 'Número máximo de linhas retornadas, ex: 5, 10'},
+            },
+            "required": ['metrics'],
+        },
+    },
 ]
 
 # --- 5. Inicialização do Modelo Gemini com Ferramentas ---
@@ -597,6 +364,21 @@ def chat_with_data_agent(query: str):
         st.error("O DataFrame está vazio. Não é possível realizar consultas. Verifique o carregamento dos dados.")
         return
 
+    # Só a primeira pergunta da conversa é cacheável: nas seguintes a resposta depende do histórico
+    is_first_turn = sum(1 for msg in st.session_state.messages if msg["role"] == "user") == 1
+    cache_key = caches.AnswerCache.make_key(query, st.session_state['dataset_fingerprint'])
+    if is_first_turn:
+        cached_message = get_answer_cache().get(cache_key)
+        if cached_message is not None:
+            st.session_state.messages.append(dict(cached_message))
+            with st.chat_message("assistant"):
+                for part_data in cached_message["parts"]:
+                    if "text" in part_data:
+                        st.markdown(part_data["text"])
+                if 'image_base64_for_display' in cached_message:
+                    st.image(base64.b64decode(cached_message['image_base64_for_display']), caption="Gráfico gerado pelo agente")
+            return
+
     # Definindo a instrução do sistema (System Prompt)
     system_instruction_text = """
     Você é um especialista em análise de dados de remuneração de administradores para companhias de capital aberto no Brasil. Sua função é responder a perguntas do usuário baseando-se exclusivamente nos dados fornecidos a partir de um arquivo CSV que contém informações detalhadas sobre salários, bônus e outras formas de remuneração para a Diretoria Estatutária, Conselho de Administração e Conselho Fiscal.
@@ -615,9 +397,15 @@ def chat_with_data_agent(query: str):
     - **Remuneração Média por Órgão e Segmento:** Calcular a média da remuneração total para um órgão específico por segmento de listagem (setor de atividade) em um ano, com a opção de gerar um gráfico.
     - **Proporção da Estrutura de Remuneração:** Determinar a proporção de empresas que utilizam diferentes estruturas de remuneração (fixa, variável, ações) para um órgão em um ano, com a opção de gerar um gráfico.
     - **Maiores e Menores Remunerações:** Listar os maiores e menores valores de remuneração total para um órgão em um ano.
+    - **Remuneração por Membro:** Listar as empresas com a maior remuneração total por membro de um órgão em um ano, com gráfico.
+    - **Composição da Remuneração por Setor:** Comparar, por setor, a participação média das parcelas fixa, variável e baseada em ações na remuneração de um órgão em um ano, com gráfico.
+    - **Amplitude da Remuneração:** Listar as empresas com a maior diferença entre a maior e a menor remuneração individual de um órgão em um ano.
+    - **Consulta Agregada Genérica:** Combinar várias métricas, agrupamentos, filtros, ordenação e limite em uma única consulta, quando nenhuma das ferramentas acima cobrir a pergunta sozinha.
 
     Sempre que a pergunta envolver números (como o número de empresas, o ano), use os valores fornecidos pelo usuário. Se um gráfico for solicitado ou puder complementar a resposta, utilize a ferramenta adequada para gerá-lo.
 
+    As ferramentas retornam dados estruturados: 'context' (parâmetros da consulta), 'columns' (nome, tipo e unidade de cada coluna: BRL para valores em reais, % para percentuais; sem 'type' a coluna é numérica), 'rows' (linhas na ordem das colunas) e, quando houver, 'totals'. Se 'truncated' for verdadeiro, apenas as primeiras linhas de 'row_count' foram enviadas; mencione isso ao usuário. Redija a resposta em português, formatando valores em BRL como R$ 1.234,56. Se houver 'chart', o gráfico já é exibido ao usuário.
+
     Se a informação solicitada não puder ser obtida com as ferramentas disponíveis ou não estiver no CSV, informe ao usuário de forma clara e objetiva. Evite dar informações genéricas ou especulativas.
     """
 
@@ -663,6 +451,7 @@ def chat_with_data_agent(query: str):
 
     # Processar a resposta do Gemini
     tool_output = {} # Inicializa tool_output para garantir que existe
+    tool_called = False
 
     if response and response.candidates and response.candidates[0].content.parts:
         # Verificar se o modelo decidiu chamar uma ferramenta
@@ -673,41 +462,19 @@ def chat_with_data_agent(query: str):
             function_args = dict(function_call.args) 
             
             # st.write(f"Agente (chamando ferramenta): {function_name} com args {function_args}") # Para depuração
+            tool_called = True
 
             try:
-                if function_name == 'get_salario_medio_diretoria':
-                    tool_output = get_salario_medio_diretoria(df_resultante, **function_args)
-                elif function_name == 'get_top_companies_by_salary':
-                    tool_output = get_top_companies_by_salary(df_resultante, **function_args)
-                elif function_name == 'get_total_bonus_by_company':
-                    tool_output = get_total_bonus_by_company(df_resultante, **function_args)
-                elif function_name == 'get_sector_bonus_range':
-                    tool_output = get_sector_bonus_range(df_resultante, **function_args)
-                elif function_name == 'get_remuneration_trend_by_orgao':
-                    tool_output = get_remuneration_trend_by_orgao(df_resultante, **function_args)
-                elif function_name == 'get_avg_bonus_effective_by_sector':
-                    tool_output = get_avg_bonus_effective_by_sector(df_resultante, **function_args)
-                elif function_name == 'get_top_sectors_by_avg_total_remuneration':
-                    tool_output = get_top_sectors_by_avg_total_remuneration(df_resultante, **function_args)
-                elif function_name == 'get_remuneration_as_percentage_of_revenue':
-                    tool_output = get_remuneration_as_percentage_of_revenue(df_resultante, **function_args)
-                elif function_name == 'get_correlation_members_bonus':
-                    tool_output = get_correlation_members_bonus(df_resultante, **function_args)
-                elif function_name == 'get_avg_remuneration_by_orgao_segment':
-                    tool_output = get_avg_remuneration_by_orgao_segment(df_resultante, **function_args)
-                elif function_name == 'get_remuneration_structure_proportion':
-                    tool_output = get_remuneration_structure_proportion(df_resultante, **function_args)
-                elif function_name == 'get_top_bottom_remuneration_values':
-                    tool_output = get_top_bottom_remuneration_values(df_resultante, **function_args)
-                else:
-                    tool_output = {'text': f"Erro: Função '{function_name}' não reconhecida ou não implementada."}
+                tool_output = analysis_tools.run_tool(function_name, df_resultante, function_args,
+                                                      cache=get_tool_result_cache(),
+                                                      dataset_fingerprint=st.session_state['dataset_fingerprint'])
             except Exception as e:
                 tool_output = {'text': f"Erro ao executar a função '{function_name}': {e}"}
 
             # Enviar o resultado da ferramenta de volta para o modelo
             try:
                 # O send_message aceita dicionários Python para function_response
-                response = chat.send_message({"function_response": {"name": function_name, "response": tool_output}})
+                response = chat.send_message({"function_response": {"name": function_name, "response": analysis_tools.model_payload(tool_output, tool_output_format)}})
             except Exception as e:
                 st.error(f"Erro ao enviar resposta da ferramenta ao Gemini: {e}")
                 st.warning("Isso pode indicar um problema na resposta da ferramenta. Tente novamente.")
@@ -739,6 +506,13 @@ def chat_with_data_agent(query: str):
             message_to_store['image_base64_for_display'] = tool_output['image_base64'] # Chave para exibição
 
         st.session_state.messages.append(message_to_store)
+        # Só guarda respostas completas: texto do modelo não vazio, sem nova chamada de função pendente e,
+        # se uma ferramenta foi usada, com resultado válido (erros e respostas vazias não são compartilhados)
+        has_model_text = any(getattr(part, 'text', None) and part.text.strip() for part in final_model_content.parts)
+        has_function_call = any(getattr(part, 'function_call', None) and part.function_call.name
+                                for part in final_model_content.parts)
+        if is_first_turn and has_model_text and not has_function_call and (not tool_called or 'columns' in tool_output):
+            get_answer_cache().put(cache_key, message_to_store)
 
         # Exibir a resposta final do modelo na interface do Streamlit
         with st.chat_message("assistant"):
@@ -775,6 +549,31 @@ for message_entry in st.session_state.messages:
             st.image(base64.b64decode(message_entry['image_base64_for_display']), caption="Gráfico gerado (Histórico)")
 
 
+# --- Administração do cache de respostas ---
+# Após atualizar os dados, a impressão digital do dataset muda e as respostas antigas deixam de ser servidas;
+# o botão de limpeza libera a memória imediatamente. O painel só é exibido se ADMIN_PASSWORD estiver nos segredos,
+# pois permite limpar os caches compartilhados e mostra os argumentos das consultas de outros usuários.
+admin_password = st.secrets.get("ADMIN_PASSWORD")
+if admin_password:
+    with st.sidebar.expander("Administração"):
+        if st.text_input("Senha de administrador", type="password") == admin_password:
+            cache_stats = get_answer_cache().stats()
+            st.metric("Taxa de acerto do cache de respostas", f"{cache_stats['hit_rate']:.0%}")
+            st.caption(f"Entradas: {cache_stats['entries']} · Acertos: {cache_stats['hits']} · Falhas: {cache_stats['misses']} · "
+                       f"Removidas (LRU): {cache_stats['evictions']} · Expiradas: {cache_stats['expirations']}")
+            tool_cache_stats = get_tool_result_cache().stats()
+            st.caption(f"Cache de ferramentas: {tool_cache_stats['entries']} entradas · taxa de acerto {tool_cache_stats['hit_rate']:.0%}")
+            if warmup_job is not None:
+                warmup_status = warmup_job.status()
+                st.caption(f"Pré-aquecimento: {warmup_status['done']}/{warmup_status['total']} chamadas em {warmup_status['elapsed_s']:.1f}s"
+                           + (f" (executando {warmup_status['current']})" if warmup_status['running'] else " (concluído)")
+                           + (f" · {len(warmup_status['failed'])} falha(s)" if warmup_status['failed'] else ""))
+            # Chamadas mais frequentes desde o início do processo, no formato de WARMUP_CALLS
+            st.code(json.dumps(get_tool_result_cache().most_requested(10), ensure_ascii=False), language="json")
+            if st.button("Limpar caches de respostas e ferramentas"):
+                removed = get_answer_cache().purge() + get_tool_result_cache().purge()
+                st.success(f"Caches limpos ({removed} entradas removidas).")
+
 # Campo de entrada para o usuário
 user_query = st.chat_input("Pergunte algo sobre os dados da CVM:")
 
@@ -0,0 +1,125 @@
+# Benchmark de memória e latência dos backends de consulta (pandas em memória x DuckDB sobre Parquet).
+# Replica o CSV atual em 1x, 10x e 100x (com nomes/CNPJs distintos por réplica, para que a cardinalidade dos
+# agrupamentos também cresça) e mede, em um subprocesso por combinação, o tempo de carga, a latência das
+# consultas usadas pelas ferramentas e o pico de memória residente do processo.
+#
+# Uso: python benchmarks/bench_backends.py [--scales 1 10 100] [--repeat 5]
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+
+import query_engine
+
+CSV_PATH = os.path.join(ROOT, 'dados_cvm_mesclados.csv')
+
+QUERIES = {
+    'salario_medio_diretoria': dict(metrics=[{'column': 'SALARIO', 'agg': 'mean'}],
+                                    filters=[{'column': 'ORGAO_ADMINISTRACAO', 'op': 'contains', 'value': 'DIRETORIA'},
+                                             {'column': 'ANO_REFER', 'op': 'eq', 'value': 2023}]),
+    'top_empresas_salario': dict(metrics=[{'column': 'SALARIO', 'agg': 'sum'}], group_by=['NOME_COMPANHIA'],
+                                 filters=[{'column': 'ANO_REFER', 'op': 'eq', 'value': 2024}],
+                                 order={'by': 'SALARIO_sum', 'direction': 'desc'}, limit=10),
+    'tendencia_orgao': dict(metrics=[{'column': 'TOTAL_REMUNERACAO_ORGAO', 'agg': 'mean'}], group_by=['ANO_REFER'],
+                            filters=[{'column': 'ORGAO_ADMINISTRACAO', 'op': 'contains', 'value': 'Conselho de Administra'}]),
+    'bonus_salario_por_setor': dict(metrics=[{'column': 'BONUS', 'agg': 'mean'}, {'column': 'SALARIO', 'agg': 'mean'}],
+                                    group_by=['SETOR_DE_ATIVDADE'],
+                                    filters=[{'column': 'ORGAO_ADMINISTRACAO', 'op': 'contains', 'value': 'Diretoria'},
+                                             {'column': 'ANO_REFER', 'op': 'between', 'values': [2022, 2024]}],
+                                    order={'by': 'BONUS_mean', 'direction': 'desc'}, limit=5),
+}
+
+
+def build_datasets(scales, workdir):
+    base = pd.read_csv(CSV_PATH, delimiter=";", encoding="utf-8-sig")
+    paths = {}
+    for scale in scales:
+        replicas = []
+        for i in range(scale):
+            replica = base.copy()
+            if i:
+                replica['NOME_COMPANHIA'] = replica['NOME_COMPANHIA'] + f' #{i}'
+                replica['CNPJ_COMPANHIA'] = replica['CNPJ_COMPANHIA'] + f'-{i}'
+            replicas.append(replica)
+        scaled = pd.concat(replicas, ignore_index=True)
+        csv_path = os.path.join(workdir, f'dados_{scale}x.csv')
+        parquet_dir = os.path.join(workdir, f'dados_{scale}x')
+        os.makedirs(parquet_dir, exist_ok=True)
+        scaled.to_csv(csv_path, sep=";", index=False, encoding="utf-8-sig")
+        # Um arquivo por ano, como ficaria o histórico completo do FRE
+        for year, part in scaled.groupby('ANO_REFER'):
+            part.to_parquet(os.path.join(parquet_dir, f'{year}.parquet'), index=False)
+        paths[scale] = {'rows': len(scaled), 'csv': csv_path, 'parquet': os.path.join(parquet_dir, '*.parquet')}
+    return paths
+
+
+def _peak_rss_mb():
+    # VmHWM é zerado no exec; ru_maxrss herdaria o pico do processo pai que gerou os dados
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_worker(backend, csv_path, parquet_path, repeat):
+    start = time.perf_counter()
+    source = query_engine.load_backend(backend, csv_path=csv_path, parquet_path=parquet_path)
+    load_s = time.perf_counter() - start
+    latencies = {}
+    for name, spec in QUERIES.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            query_engine.aggregate(source, **spec)
+            timings.append(time.perf_counter() - start)
+        latencies[name] = statistics.median(timings) * 1000
+    print(json.dumps({'load_s': load_s, 'latency_ms': latencies, 'peak_rss_mb': _peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--backends', nargs='+', default=['pandas', 'duckdb'])
+    parser.add_argument('--worker', nargs=3, metavar=('BACKEND', 'CSV', 'PARQUET'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(*args.worker, repeat=args.repeat)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        datasets = build_datasets(args.scales, workdir)
+        header = f"{'escala':>6} {'linhas':>9} {'backend':>8} {'carga (s)':>10} {'pico RSS (MB)':>14}  " + \
+                 "  ".join(f"{name} (ms)" for name in QUERIES)
+        print(header)
+        for scale, paths in datasets.items():
+            for backend in args.backends:
+                # Subprocesso novo por combinação: o pico de RSS não é contaminado pelas medições anteriores
+                out = subprocess.run([sys.executable, __file__, '--repeat', str(args.repeat),
+                                      '--worker', backend, paths['csv'], paths['parquet']],
+                                     check=True, capture_output=True, text=True).stdout
+                result = json.loads(out.strip().splitlines()[-1])
+                latencies = "  ".join(f"{result['latency_ms'][name]:>{len(name) + 5}.1f}" for name in QUERIES)
+                print(f"{scale:>5}x {paths['rows']:>9} {backend:>8} {result['load_s']:>10.2f} {result['peak_rss_mb']:>14.1f}  {latencies}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+# Mede o tamanho da function_response e a latência da segunda chamada ao modelo sobre o corpus de perguntas
+# salvas em benchmarks/request_corpus.jsonl:
+#   antes  - a function_response da versão original das ferramentas (texto redigido por ferramenta + gráfico em
+#            base64), congelada em benchmarks/baseline_payloads.jsonl por freeze_baseline_payloads.py
+#   depois - o resultado estruturado atual (TOOL_OUTPUT_FORMAT='structured'), sem imagem
+# O "antes" é reportado em duas parcelas (texto e imagem), para separar o ganho de remover o gráfico do ganho de
+# trocar o texto por linhas estruturadas. Perguntas de ferramentas que não existiam na versão original aparecem
+# sem "antes" e ficam fora dos totais comparativos.
+#
+# Por padrão usa um modelo stub local: a latência é modelada (custo fixo + custo por token de entrada), portanto
+# apenas reexpressa o tamanho do payload. Com --live e GEMINI_API_KEY definida, a latência é medida no Gemini;
+# como a referência não versiona os PNGs, o "antes" é enviado com uma imagem de preenchimento do mesmo tamanho.
+#
+# Uso: python benchmarks/bench_tool_payloads.py [--live] [--stub-base-ms 300] [--stub-ms-per-token 0.02]
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import matplotlib
+matplotlib.use('Agg')
+
+import analysis_tools
+import query_engine
+
+CORPUS_PATH = os.path.join(ROOT, 'benchmarks', 'request_corpus.jsonl')
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline_payloads.jsonl')
+CSV_PATH = os.path.join(ROOT, 'dados_cvm_mesclados.csv')
+
+
+def _payload_bytes(payload):
+    return len(json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+
+
+def _call_key(tool, args):
+    return tool, json.dumps(args, sort_keys=True, ensure_ascii=False)
+
+
+def _load_baseline():
+    with open(BASELINE_PATH, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return {_call_key(r['tool'], r['args']): r for r in records}
+
+
+def _baseline_payload(record):
+    # Texto original e uma imagem de preenchimento com o mesmo número de caracteres do PNG em base64
+    image = 'A' * record['image_base64_chars'] if record['image_base64_chars'] else None
+    return {'text': record['text'], 'image_base64': image}
+
+
+def _estimate_tokens(payload):
+    # Aproximação usual de ~4 bytes por token
+    return _payload_bytes(payload) // 4
+
+
+class StubModel:
+    def __init__(self, base_ms, ms_per_token):
+        self.base_ms = base_ms
+        self.ms_per_token = ms_per_token
+
+    def send_function_response(self, entry, payload):
+        start = time.perf_counter()
+        time.sleep((self.base_ms + self.ms_per_token * _estimate_tokens(payload)) / 1000)
+        return time.perf_counter() - start
+
+
+class LiveModel:
+    def __init__(self, model_name):
+        import google.generativeai as genai
+        genai.configure(api_key=os.environ['GEMINI_API_KEY'])
+        self.model = genai.GenerativeModel(model_name=model_name)
+
+    def send_function_response(self, entry, payload):
+        chat = self.model.start_chat(history=[
+            {"role": "user", "parts": [{"text": entry['question']}]},
+            {"role": "model", "parts": [{"function_call": {"name": entry['tool'], "args": entry['args']}}]},
+        ])
+        start = time.perf_counter()
+        chat.send_message({"function_response": {"name": entry['tool'], "response": payload}})
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--live', action='store_true', help='Usa o Gemini real (requer GEMINI_API_KEY)')
+    parser.add_argument('--model', default='gemini-2.0-flash')
+    parser.add_argument('--stub-base-ms', type=float, default=300.0)
+    parser.add_argument('--stub-ms-per-token', type=float, default=0.02)
+    args = parser.parse_args()
+
+    model = LiveModel(args.model) if args.live else StubModel(args.stub_base_ms, args.stub_ms_per_token)
+    df = query_engine.load_backend('pandas', csv_path=CSV_PATH)
+    with open(CORPUS_PATH, encoding='utf-8') as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    latency_label = 'medida (Gemini)' if args.live else 'modelada (stub)'
+    baseline = _load_baseline()
+    before = {'texto': [], 'imagem': [], 'total': [], 'latency': []}
+    after = {'comparavel': [], 'todas': [], 'latency': []}
+    print(f"{'ferramenta':<40} {'antes: texto':>12} {'antes: img':>10} {'depois':>8} {'antes (ms)':>10} {'depois (ms)':>11}")
+    for entry in corpus:
+        tool_output = getattr(analysis_tools, entry['tool'])(df, **entry['args'])
+        payload = analysis_tools.model_payload(tool_output, 'structured')
+        size = _payload_bytes(payload)
+        latency = model.send_function_response(entry, payload) * 1000
+        after['todas'].append(size)
+        record = baseline.get(_call_key(entry['tool'], entry['args']))
+        if record is None:
+            print(f"{entry['tool']:<40} {'—':>12} {'—':>10} {size:>8} {'—':>10} {latency:>11.0f}")
+            continue
+        before_payload = _baseline_payload(record)
+        before_latency = model.send_function_response(entry, before_payload) * 1000
+        image = record['image_base64_chars']
+        before['texto'].append(record['payload_bytes'] - image)
+        before['imagem'].append(image)
+        before['total'].append(record['payload_bytes'])
+        before['latency'].append(before_latency)
+        after['comparavel'].append(size)
+        after['latency'].append(latency)
+        print(f"{entry['tool']:<40} {before['texto'][-1]:>12} {image:>10} {size:>8} {before_latency:>10.0f} {latency:>11.0f}")
+
+    print()
+    print(f"{len(before['total'])} de {len(corpus)} perguntas com referência (revisão original das ferramentas):")
+    print(f"  antes, texto      total {sum(before['texto']):>9} B  mediana {statistics.median(before['texto']):>8.0f} B")
+    print(f"  antes, imagem     total {sum(before['imagem']):>9} B  mediana {statistics.median(before['imagem']):>8.0f} B")
+    print(f"  antes, payload    total {sum(before['total']):>9} B  mediana {statistics.median(before['total']):>8.0f} B  "
+          f"latência {latency_label} mediana {statistics.median(before['latency']):>7.0f} ms")
+    print(f"  depois            total {sum(after['comparavel']):>9} B  mediana {statistics.median(after['comparavel']):>8.0f} B  "
+          f"latência {latency_label} mediana {statistics.median(after['latency']):>7.0f} ms")
+    print(f"Todas as {len(corpus)} perguntas, depois: total {sum(after['todas'])} B")
+
+if __name__ == '__main__':
+    main()
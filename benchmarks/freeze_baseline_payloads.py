@@ -0,0 +1,82 @@
+# Congela a function_response das ferramentas antes dos resultados estruturados: executa as funções get_* do
+# app.py de uma revisão anterior (padrão: a versão original, com texto redigido por ferramenta e o gráfico em
+# base64 enviados ao modelo) sobre o corpus de benchmarks/request_corpus.jsonl e grava o resultado em
+# benchmarks/baseline_payloads.jsonl, usado como "antes" por bench_tool_payloads.py.
+#
+# O texto é gravado por inteiro; da imagem guarda-se apenas o tamanho, para não versionar os PNGs.
+# Perguntas atendidas por ferramentas que não existiam na revisão ficam sem linha de referência.
+#
+# Uso: python benchmarks/freeze_baseline_payloads.py [--rev 3e6cd08]
+
+import argparse
+import ast
+import base64
+import io
+import json
+import os
+import subprocess
+import sys
+
+import matplotlib
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+import pandas as pd
+import seaborn as sns
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_PATH = os.path.join(ROOT, 'benchmarks', 'request_corpus.jsonl')
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline_payloads.jsonl')
+CSV_PATH = os.path.join(ROOT, 'dados_cvm_mesclados.csv')
+
+
+def load_baseline_tools(rev):
+    # Apenas as funções get_* e a configuração de gráficos (sns.*/plt.*) do módulo: o restante do app.py é a
+    # interface do Streamlit e não pode ser importado fora dele
+    source = subprocess.run(['git', 'show', f'{rev}:app.py'], cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    tree = ast.parse(source)
+    body = []
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name.startswith('get_'):
+            body.append(node)
+        elif isinstance(node, (ast.Expr, ast.Assign)) and ast.get_source_segment(source, node).startswith(('sns.', 'plt.')):
+            body.append(node)
+    namespace = {'pd': pd, 'plt': plt, 'sns': sns, 'io': io, 'base64': base64}
+    exec(compile(ast.Module(body=body, type_ignores=[]), f'{rev}:app.py', 'exec'), namespace)
+    return {name: func for name, func in namespace.items() if name.startswith('get_') and callable(func)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rev', default='3e6cd08', help='Revisão do app.py usada como referência')
+    args = parser.parse_args()
+
+    tools = load_baseline_tools(args.rev)
+    # Mesma carga do app.py da revisão: CSV bruto, sem colunas derivadas
+    df = pd.read_csv(CSV_PATH, delimiter=";", encoding="utf-8-sig")
+    with open(CORPUS_PATH, encoding='utf-8') as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    written = 0
+    with open(BASELINE_PATH, 'w', encoding='utf-8') as out:
+        for entry in corpus:
+            if entry['tool'] not in tools:
+                continue
+            # O app da revisão enviava o dicionário retornado pela ferramenta como function_response
+            response = tools[entry['tool']](df, **entry['args'])
+            image = response.get('image_base64')
+            record = {
+                'tool': entry['tool'],
+                'args': entry['args'],
+                'rev': args.rev,
+                'text': response.get('text', ''),
+                'image_base64_chars': len(image) if image else 0,
+                'payload_bytes': len(json.dumps(response, ensure_ascii=False).encode('utf-8')),
+            }
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            written += 1
+    print(f"{written} de {len(corpus)} perguntas com referência gravadas em {os.path.relpath(BASELINE_PATH, ROOT)}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
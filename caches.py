@@ -0,0 +1,145 @@
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence
+
+
+# --- Normalização das perguntas ---
+# Perguntas equivalentes ("Qual o salário médio da Diretoria em 2024?" / "qual o salario medio da diretoria em 2024")
+# devem gerar a mesma chave: acentos removidos, caixa baixa, espaços colapsados e números em forma canônica.
+
+_THOUSANDS_RE = re.compile(r'(?<![\d.,])(\d{1,3}(?:\.\d{3})+)(?![\d.])')
+# Só frações de 1 ou 2 dígitos são decimais: "2020,2030" é uma lista de anos, não 2020.203
+_DECIMAL_RE = re.compile(r'(?<![\d.,])(\d+)[.,](\d{1,2})(?![\d.,])')
+_TRAILING_ZEROS_RE = re.compile(r'(?<![\d.])(\d+)\.(\d??)0{1,2}(?![\d.])')
+_NUMBER_LIST_RE = re.compile(r'(\d),(?=\d)')
+_PUNCTUATION_RE = re.compile(r'[?!.;:,"\'`´]+(?=\s|$)')
+_SPACES_RE = re.compile(r'\s+')
+
+
+def _canonical_numbers(text: str) -> str:
+    # 1.000.000 -> 1000000 ; 10,5 -> 10.5 ; 10,50 / 10.0 -> 10.5 / 10 ; 2022,2023 -> 2022, 2023
+    text = _THOUSANDS_RE.sub(lambda m: m.group(1).replace('.', ''), text)
+    text = _DECIMAL_RE.sub(r'\1.\2', text)
+    text = _TRAILING_ZEROS_RE.sub(lambda m: f"{m.group(1)}.{m.group(2)}" if m.group(2) else m.group(1), text)
+    text = _NUMBER_LIST_RE.sub(r'\1, ', text)
+    return text
+
+
+def normalize_question(question: str) -> str:
+    text = unicodedata.normalize('NFKD', question)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = _canonical_numbers(text)
+    text = _PUNCTUATION_RE.sub(' ', text)
+    return _SPACES_RE.sub(' ', text).strip()
+
+
+# --- Caches compartilhados entre sessões ---
+# LRU com expiração por tempo. As chaves sempre incluem a impressão digital do dataset,
+# de modo que uma atualização dos dados nunca sirva resultados antigos.
+
+class TTLCache:
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 24 * 3600):
+        self.max_entries = int(max_entries)
+        self.ttl_seconds = float(ttl_seconds)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def purge(self) -> int:
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+            }
+
+
+class AnswerCache(TTLCache):
+    @staticmethod
+    def make_key(question: str, dataset_fingerprint: str) -> tuple:
+        return (dataset_fingerprint, normalize_question(question))
+
+
+def _canonical_args(value):
+    # 2024.0 (como o Gemini envia inteiros) e 2024 geram a mesma chave
+    if isinstance(value, Mapping):
+        return {str(k): _canonical_args(v) for k, v in value.items() if v is not None}
+    if isinstance(value, Sequence) and not isinstance(value, (str, bytes)):
+        return [_canonical_args(v) for v in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def canonical_call(tool_name: str, args: dict) -> dict:
+    # Chamada no formato de WARMUP_CALLS; é o que fica registrado no log a cada execução de ferramenta
+    return {'tool': tool_name, 'args': _canonical_args(args)}
+
+
+class ToolResultCache(TTLCache):
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 24 * 3600, max_counted_calls: int = 1000):
+        super().__init__(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.max_counted_calls = int(max_counted_calls)
+        self._call_counts = OrderedDict()
+
+    @staticmethod
+    def make_key(tool_name: str, args: dict, dataset_fingerprint: str) -> tuple:
+        return (dataset_fingerprint, tool_name, json.dumps(_canonical_args(args), sort_keys=True, ensure_ascii=False))
+
+    def record_call(self, key):
+        # Conta as chamadas por ferramenta/argumentos para derivar a lista de pré-aquecimento.
+        # Contador limitado (LRU): combinações de argumentos que não se repetem acabam descartadas.
+        call = key[1:]
+        with self._lock:
+            self._call_counts[call] = self._call_counts.get(call, 0) + 1
+            self._call_counts.move_to_end(call)
+            while len(self._call_counts) > self.max_counted_calls:
+                self._call_counts.popitem(last=False)
+
+    def most_requested(self, n: int = 10) -> list:
+        with self._lock:
+            ranked = sorted(self._call_counts.items(), key=lambda item: item[1], reverse=True)[:n]
+        return [{'tool': tool, 'args': json.loads(args), 'count': count} for (tool, args), count in ranked]
@@ -0,0 +1,505 @@
+import glob
+import hashlib
+import os
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+# --- Whitelist de colunas do dataset ---
+# Colunas que podem ser usadas para agrupar/filtrar (dimensões) e colunas numéricas que podem ser agregadas (métricas).
+# Qualquer coluna fora dessas listas é rejeitada antes de tocar no DataFrame.
+
+DIMENSION_COLUMNS = [
+    'CNPJ_COMPANHIA',
+    'NOME_COMPANHIA',
+    'ORGAO_ADMINISTRACAO',
+    'SETOR_DE_ATIVDADE',
+    'ANO_REFER',
+    'ESTRUTURA_REMUNERACAO',
+]
+
+METRIC_COLUMNS = [
+    'QTD_MEMBROS_REMUNERADOS_ACAO',
+    'DILUICAO_POTENCIAL',
+    'PRECO_MEDIO_PONDERADO_OPCOES_EM_ABERTO',
+    'PRECO_MEDIO_PONDERADO_OPCOES_PERDIDAS',
+    'PRECO_MEDIO_PONDERADO_OPCOES_EXERCIDAS',
+    'NUM_MEMBROS_REMUNERADOS_MIN_MAX_MEDIA',
+    'VALOR_MAIOR_REMUNERACAO',
+    'VALOR_MENOR_REMUNERACAO',
+    'VALOR_MEDIO_REMUNERACAO',
+    'TOTAL_REMUNERACAO',
+    'TOTAL_REMUNERACAO_ORGAO',
+    'NUM_MEMBROS_REMUNERADOS_TOTAL',
+    'SALARIO',
+    'BENEFICIOS_DIRETOS_INDIRETOS',
+    'PARTICIPACOES_COMITES',
+    'OUTROS_VALORES_FIXOS',
+    'BONUS',
+    'PARTICIPACAO_RESULTADOS',
+    'PARTICIPACAO_REUNIOES',
+    'OUTROS_VALORES_VARIAVEIS',
+    'COMISSOES',
+    'POS_EMPREGO',
+    'CESSACAO_CARGO',
+    'BASEADA_ACOES',
+    'QTD_MEMBROS_REMUNERADOS_VARIAVEL',
+    'BONUS_VALOR_MINIMO',
+    'BONUS_VALOR_MAXIMO',
+    'BONUS_VALOR_METAS_ATINGIDAS',
+    'BONUS_VALOR_EFETIVO',
+    'PARTICIPACAO_VALOR_MINIMO',
+    'PARTICIPACAO_VALOR_MAXIMO',
+    'PARTICIPACAO_VALOR_METAS_ATINGIDAS',
+    'PARTICIPACAO_VALOR_EFETIVO',
+    'ANO_REFER',
+    # Colunas derivadas (ver add_derived_columns)
+    'REMUNERACAO_POR_MEMBRO',
+    'BONUS_POR_MEMBRO',
+    'REMUNERACAO_FIXA',
+    'REMUNERACAO_VARIAVEL',
+    'REMUNERACAO_ACOES',
+    'PCT_REMUNERACAO_FIXA',
+    'PCT_REMUNERACAO_VARIAVEL',
+    'PCT_REMUNERACAO_ACOES',
+    'AMPLITUDE_REMUNERACAO',
+]
+
+AGGREGATIONS = {
+    'sum': 'soma',
+    'mean': 'média',
+    'median': 'mediana',
+    'min': 'mínimo',
+    'max': 'máximo',
+    'count': 'contagem',
+}
+
+FILTER_OPERATORS = ['eq', 'ne', 'gt', 'gte', 'lt', 'lte', 'between', 'in', 'contains']
+
+# Limite de linhas devolvidas pela consulta genérica, para não inundar a resposta da ferramenta
+MAX_AGGREGATE_ROWS = 50
+
+
+class AggregateSpecError(ValueError):
+    pass
+
+
+# --- Colunas derivadas, calculadas uma única vez no carregamento ---
+# Valores por membro (divisão só quando há membros > 0), composição fixa/variável/ações (fixa = SALARIO +
+# BENEFICIOS_DIRETOS_INDIRETOS, variável = BONUS + PARTICIPACAO_RESULTADOS, ações = BASEADA_ACOES; nulos contam
+# como zero desde que algum componente exista), participação percentual de cada parte no total (nula quando o
+# total é zero) e amplitude entre a maior e a menor remuneração individual.
+
+DERIVED_INPUT_COLUMNS = [
+    'TOTAL_REMUNERACAO_ORGAO', 'NUM_MEMBROS_REMUNERADOS_TOTAL', 'BONUS', 'SALARIO', 'BENEFICIOS_DIRETOS_INDIRETOS',
+    'PARTICIPACAO_RESULTADOS', 'BASEADA_ACOES', 'VALOR_MAIOR_REMUNERACAO', 'VALOR_MENOR_REMUNERACAO',
+]
+
+STRUCTURE_LABELS = ["Fixa, Variável e Ações", "Fixa e Variável", "Fixa e Ações", "Somente Fixa", "Outra/Não Classificada"]
+
+
+def add_derived_columns(df: pd.DataFrame) -> pd.DataFrame:
+    if any(c not in df.columns for c in DERIVED_INPUT_COLUMNS):
+        return df
+    members = df['NUM_MEMBROS_REMUNERADOS_TOTAL'].where(df['NUM_MEMBROS_REMUNERADOS_TOTAL'] > 0)
+    fixa = df[['SALARIO', 'BENEFICIOS_DIRETOS_INDIRETOS']].sum(axis=1, min_count=1)
+    variavel = df[['BONUS', 'PARTICIPACAO_RESULTADOS']].sum(axis=1, min_count=1)
+    acoes = df['BASEADA_ACOES']
+    total = fixa.fillna(0) + variavel.fillna(0) + acoes.fillna(0)
+    total = total.where(total > 0)
+    has_fixa, has_variavel, has_acoes = (fixa > 0).to_numpy(), (variavel > 0).to_numpy(), (acoes > 0).to_numpy()
+    estrutura = np.select([has_fixa & has_variavel & has_acoes, has_fixa & has_variavel, has_fixa & has_acoes, has_fixa],
+                          STRUCTURE_LABELS[:4], default=STRUCTURE_LABELS[4])
+    return df.assign(
+        REMUNERACAO_POR_MEMBRO=df['TOTAL_REMUNERACAO_ORGAO'] / members,
+        BONUS_POR_MEMBRO=df['BONUS'] / members,
+        REMUNERACAO_FIXA=fixa,
+        REMUNERACAO_VARIAVEL=variavel,
+        REMUNERACAO_ACOES=acoes,
+        PCT_REMUNERACAO_FIXA=fixa.fillna(0) / total * 100,
+        PCT_REMUNERACAO_VARIAVEL=variavel.fillna(0) / total * 100,
+        PCT_REMUNERACAO_ACOES=acoes.fillna(0) / total * 100,
+        AMPLITUDE_REMUNERACAO=df['VALOR_MAIOR_REMUNERACAO'] - df['VALOR_MENOR_REMUNERACAO'],
+        ESTRUTURA_REMUNERACAO=estrutura,
+    )
+
+
+def _derived_columns_sql(source: str) -> str:
+    # Mesmas regras de add_derived_columns, como subconsulta sobre os arquivos Parquet
+    inner = f"""SELECT *,
+        CASE WHEN "NUM_MEMBROS_REMUNERADOS_TOTAL" > 0 THEN "TOTAL_REMUNERACAO_ORGAO" / "NUM_MEMBROS_REMUNERADOS_TOTAL" END AS "REMUNERACAO_POR_MEMBRO",
+        CASE WHEN "NUM_MEMBROS_REMUNERADOS_TOTAL" > 0 THEN "BONUS" / "NUM_MEMBROS_REMUNERADOS_TOTAL" END AS "BONUS_POR_MEMBRO",
+        CASE WHEN "SALARIO" IS NOT NULL OR "BENEFICIOS_DIRETOS_INDIRETOS" IS NOT NULL
+             THEN COALESCE("SALARIO", 0) + COALESCE("BENEFICIOS_DIRETOS_INDIRETOS", 0) END AS "REMUNERACAO_FIXA",
+        CASE WHEN "BONUS" IS NOT NULL OR "PARTICIPACAO_RESULTADOS" IS NOT NULL
+             THEN COALESCE("BONUS", 0) + COALESCE("PARTICIPACAO_RESULTADOS", 0) END AS "REMUNERACAO_VARIAVEL",
+        "BASEADA_ACOES" AS "REMUNERACAO_ACOES",
+        "VALOR_MAIOR_REMUNERACAO" - "VALOR_MENOR_REMUNERACAO" AS "AMPLITUDE_REMUNERACAO"
+        FROM {source}"""
+    total = 'COALESCE("REMUNERACAO_FIXA", 0) + COALESCE("REMUNERACAO_VARIAVEL", 0) + COALESCE("REMUNERACAO_ACOES", 0)'
+    fixa, variavel, acoes = '"REMUNERACAO_FIXA" > 0', '"REMUNERACAO_VARIAVEL" > 0', '"REMUNERACAO_ACOES" > 0'
+    return f"""(SELECT *,
+        CASE WHEN {total} > 0 THEN COALESCE("REMUNERACAO_FIXA", 0) / ({total}) * 100 END AS "PCT_REMUNERACAO_FIXA",
+        CASE WHEN {total} > 0 THEN COALESCE("REMUNERACAO_VARIAVEL", 0) / ({total}) * 100 END AS "PCT_REMUNERACAO_VARIAVEL",
+        CASE WHEN {total} > 0 THEN COALESCE("REMUNERACAO_ACOES", 0) / ({total}) * 100 END AS "PCT_REMUNERACAO_ACOES",
+        CASE WHEN {fixa} AND {variavel} AND {acoes} THEN '{STRUCTURE_LABELS[0]}'
+             WHEN {fixa} AND {variavel} THEN '{STRUCTURE_LABELS[1]}'
+             WHEN {fixa} AND {acoes} THEN '{STRUCTURE_LABELS[2]}'
+             WHEN {fixa} THEN '{STRUCTURE_LABELS[3]}'
+             ELSE '{STRUCTURE_LABELS[4]}' END AS "ESTRUTURA_REMUNERACAO"
+        FROM ({inner}))"""
+
+
+# --- Normalização e validação da especificação ---
+# Os argumentos vindos do Gemini chegam como MapComposite/RepeatedComposite; convertemos para tipos Python simples.
+
+def _to_python(value):
+    if isinstance(value, Mapping):
+        return {str(k): _to_python(v) for k, v in value.items()}
+    if isinstance(value, Sequence) and not isinstance(value, (str, bytes)):
+        return [_to_python(v) for v in value]
+    return value
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    value = _to_python(value)
+    if isinstance(value, (str, dict)):
+        return [value]
+    return list(value)
+
+
+def _normalize_metrics(metrics):
+    normalized = []
+    for metric in _as_list(metrics):
+        if isinstance(metric, str):
+            # Aceita a forma abreviada "COLUNA:agg"
+            column, _, agg = metric.partition(':')
+            metric = {'column': column, 'agg': agg or 'sum'}
+        if not isinstance(metric, Mapping):
+            raise AggregateSpecError(f"Métrica inválida: {metric!r}. Use um objeto com 'column' e 'agg' ou \"COLUNA:agg\".")
+        column = str(metric.get('column', '')).strip().upper()
+        agg = str(metric.get('agg', 'sum')).strip().lower()
+        if column not in METRIC_COLUMNS:
+            raise AggregateSpecError(f"Coluna de métrica '{column}' não permitida. Use uma de: {', '.join(METRIC_COLUMNS)}.")
+        if agg not in AGGREGATIONS:
+            raise AggregateSpecError(f"Agregação '{agg}' não suportada. Use uma de: {', '.join(AGGREGATIONS)}.")
+        normalized.append({'column': column, 'agg': agg, 'alias': f"{column}_{agg}"})
+    if not normalized:
+        raise AggregateSpecError("Informe ao menos uma métrica (coluna e agregação).")
+    aliases = [m['alias'] for m in normalized]
+    if len(set(aliases)) != len(aliases):
+        raise AggregateSpecError("Métricas duplicadas na consulta.")
+    return normalized
+
+
+def _normalize_group_by(group_by):
+    normalized = []
+    for column in _as_list(group_by):
+        column = str(column).strip().upper()
+        if column not in DIMENSION_COLUMNS:
+            raise AggregateSpecError(f"Coluna de agrupamento '{column}' não permitida. Use uma de: {', '.join(DIMENSION_COLUMNS)}.")
+        if column not in normalized:
+            normalized.append(column)
+    return normalized
+
+
+def _normalize_filters(filters):
+    normalized = []
+    for spec in _as_list(filters):
+        if not isinstance(spec, Mapping):
+            raise AggregateSpecError(f"Filtro inválido: {spec!r}. Use um objeto com 'column', 'op' e 'value'.")
+        column = str(spec.get('column', '')).strip().upper()
+        op = str(spec.get('op', 'eq')).strip().lower()
+        if column not in DIMENSION_COLUMNS and column not in METRIC_COLUMNS:
+            raise AggregateSpecError(f"Coluna de filtro '{column}' não permitida.")
+        if op not in FILTER_OPERATORS:
+            raise AggregateSpecError(f"Operador de filtro '{op}' não suportado. Use um de: {', '.join(FILTER_OPERATORS)}.")
+        if op in ('between', 'in'):
+            value = _as_list(spec.get('values', spec.get('value')))
+            if op == 'between' and len(value) != 2:
+                raise AggregateSpecError(f"O filtro 'between' em '{column}' exige exatamente dois valores.")
+        else:
+            value = spec.get('value')
+            if value is None:
+                raise AggregateSpecError(f"O filtro '{op}' em '{column}' exige um valor.")
+        normalized.append({'column': column, 'op': op, 'value': value})
+    return normalized
+
+
+def _normalize_order(order, metrics, group_by):
+    if not order:
+        return None
+    order = _to_python(order)
+    if isinstance(order, list):
+        order = order[0] if order else {}
+    if isinstance(order, str):
+        order = {'by': order}
+    by = str(order.get('by', '')).strip()
+    direction = str(order.get('direction', 'desc')).strip().lower()
+    aliases = [m['alias'] for m in metrics]
+    if by not in aliases and by not in group_by:
+        # Permite ordenar pelo nome da coluna quando há uma única métrica sobre ela
+        candidates = [m['alias'] for m in metrics if m['column'] == by.upper()]
+        if len(candidates) != 1:
+            raise AggregateSpecError(f"Ordenação por '{by}' inválida. Use uma das métricas ({', '.join(aliases)}) ou colunas de agrupamento.")
+        by = candidates[0]
+    if direction not in ('asc', 'desc'):
+        raise AggregateSpecError("A direção da ordenação deve ser 'asc' ou 'desc'.")
+    return {'by': by, 'ascending': direction == 'asc'}
+
+
+# --- Compilação dos filtros em uma única máscara vetorizada ---
+
+def _coerce_filter_value(series, value):
+    if pd.api.types.is_numeric_dtype(series):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise AggregateSpecError(f"Valor '{value}' inválido para a coluna numérica '{series.name}'.")
+    return str(value)
+
+
+def _filter_mask(df, filters):
+    mask = np.ones(len(df), dtype=bool)
+    for spec in filters:
+        series = df[spec['column']]
+        op, value = spec['op'], spec['value']
+        if op == 'contains':
+            cond = series.astype('string').str.contains(str(value), na=False, case=False, regex=False).to_numpy(dtype=bool)
+        elif op == 'in':
+            cond = series.isin([_coerce_filter_value(series, v) for v in value]).to_numpy()
+        elif op == 'between':
+            low, high = (_coerce_filter_value(series, v) for v in value)
+            cond = series.between(low, high).to_numpy()
+        else:
+            value = _coerce_filter_value(series, value)
+            if op == 'eq':
+                cond = (series == value).to_numpy()
+            elif op == 'ne':
+                cond = (series != value).to_numpy()
+            elif op == 'gt':
+                cond = (series > value).to_numpy()
+            elif op == 'gte':
+                cond = (series >= value).to_numpy()
+            elif op == 'lt':
+                cond = (series < value).to_numpy()
+            else:
+                cond = (series <= value).to_numpy()
+        mask &= cond
+    return mask
+
+
+def _compile_spec(metrics, group_by, filters, order, limit):
+    metrics = _normalize_metrics(metrics)
+    group_by = _normalize_group_by(group_by)
+    filters = _normalize_filters(filters)
+    order = _normalize_order(order, metrics, group_by)
+    if limit is not None:
+        limit = int(limit)
+        if limit <= 0:
+            raise AggregateSpecError("O limite deve ser um inteiro positivo.")
+    return {'metrics': metrics, 'group_by': group_by, 'filters': filters, 'order': order, 'limit': limit}
+
+
+def _check_columns(available, columns):
+    missing = [c for c in dict.fromkeys(columns) if c not in available]
+    if missing:
+        raise AggregateSpecError(f"Colunas não encontradas no dataset: {', '.join(missing)}.")
+
+
+def _aggregate_pandas(df, spec):
+    metrics, group_by, filters = spec['metrics'], spec['group_by'], spec['filters']
+    _check_columns(df.columns, group_by + [m['column'] for m in metrics] + [f['column'] for f in filters])
+
+    # Filtros aplicados antes da projeção: apenas as linhas e colunas necessárias seguem para a agregação
+    projected = list(dict.fromkeys(group_by + [m['column'] for m in metrics]))
+    if filters:
+        subset = df.loc[_filter_mask(df, filters), projected]
+    else:
+        subset = df[projected]
+
+    result_columns = group_by + [m['alias'] for m in metrics]
+    if subset.empty:
+        return pd.DataFrame(columns=result_columns)
+
+    named = {m['alias']: pd.NamedAgg(column=m['column'], aggfunc=m['agg']) for m in metrics}
+    if group_by:
+        result = subset.groupby(group_by, sort=True, observed=True).agg(**named).reset_index()
+    else:
+        result = pd.DataFrame([{m['alias']: subset[m['column']].agg(m['agg']) for m in metrics}])
+
+    if spec['order'] is not None:
+        result = result.sort_values(spec['order']['by'], ascending=spec['order']['ascending'], na_position='last', kind='mergesort')
+    if spec['limit'] is not None:
+        result = result.head(spec['limit'])
+    return result[result_columns].reset_index(drop=True)
+
+
+def _scan_pandas(df, columns, filters):
+    _check_columns(df.columns, list(columns) + [f['column'] for f in filters])
+    if filters:
+        return df.loc[_filter_mask(df, filters), list(columns)].copy()
+    return df[list(columns)].copy()
+
+
+# --- Backend DuckDB sobre Parquet (fora da memória) ---
+# Lê os arquivos Parquet sob demanda: filtros viram WHERE e apenas as colunas usadas são lidas (pushdown de predicado e projeção).
+# Expõe a mesma interface usada pelas ferramentas sobre o DataFrame (.empty, .columns, aggregate/scan).
+
+_SQL_AGGREGATIONS = {
+    'sum': 'COALESCE(SUM({col}), 0)',
+    'mean': 'AVG({col})',
+    'median': 'MEDIAN({col})',
+    'min': 'MIN({col})',
+    'max': 'MAX({col})',
+    'count': 'COUNT({col})',
+}
+
+_SQL_OPERATORS = {'eq': '=', 'ne': '<>', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+_SQL_NUMERIC_TYPES = ('TINYINT', 'SMALLINT', 'INTEGER', 'BIGINT', 'HUGEINT', 'FLOAT', 'DOUBLE', 'DECIMAL',
+                      'UTINYINT', 'USMALLINT', 'UINTEGER', 'UBIGINT')
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+class DuckDBBackend:
+    def __init__(self, parquet_path: str):
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError("O backend 'duckdb' requer o pacote duckdb (pip install duckdb).")
+        self.parquet_path = parquet_path
+        self._con = duckdb.connect(database=':memory:')
+        self._source = f"read_parquet({self._sql_literal(parquet_path)}, union_by_name = true)"
+        schema = self._con.execute(f"DESCRIBE SELECT * FROM {self._source}").fetchall()
+        if all(c in [name for name, *_ in schema] for c in DERIVED_INPUT_COLUMNS):
+            self._source = _derived_columns_sql(self._source)
+            schema = self._con.execute(f"DESCRIBE SELECT * FROM {self._source}").fetchall()
+        self._types = {name: col_type for name, col_type, *_ in schema}
+        self.columns = pd.Index(list(self._types))
+        self._num_rows = None
+
+    @staticmethod
+    def _sql_literal(value):
+        return "'" + str(value).replace("'", "''") + "'"
+
+    @property
+    def empty(self) -> bool:
+        if self._num_rows is None:
+            self._num_rows = self._query(f"SELECT COUNT(*) FROM {self._source}").fetchone()[0]
+        return self._num_rows == 0
+
+    def _query(self, sql, params=None):
+        # Um cursor por consulta: a conexão pode ser compartilhada entre as sessões do Streamlit
+        return self._con.cursor().execute(sql, params or [])
+
+    def _is_numeric(self, column):
+        return self._types[column].upper().startswith(_SQL_NUMERIC_TYPES)
+
+    def _coerce(self, column, value):
+        if self._is_numeric(column):
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                raise AggregateSpecError(f"Valor '{value}' inválido para a coluna numérica '{column}'.")
+        return str(value)
+
+    def _where(self, filters, not_null=()):
+        clauses, params = [], []
+        for spec in filters:
+            col, op, value = _quote(spec['column']), spec['op'], spec['value']
+            if op == 'contains':
+                # Mesma semântica de str.contains(case=False, regex=False): texto literal sem diferenciar maiúsculas
+                clauses.append(f"contains(lower(CAST({col} AS VARCHAR)), lower(?))")
+                params.append(str(value))
+            elif op == 'in' and not value:
+                # "IN ()" não é SQL válido; lista vazia não seleciona nenhuma linha, como no pandas
+                clauses.append("FALSE")
+            elif op == 'in':
+                clauses.append(f"{col} IN ({', '.join('?' for _ in value)})")
+                params.extend(self._coerce(spec['column'], v) for v in value)
+            elif op == 'between':
+                clauses.append(f"{col} BETWEEN ? AND ?")
+                params.extend(self._coerce(spec['column'], v) for v in value)
+            else:
+                clauses.append(f"{col} {_SQL_OPERATORS[op]} ?")
+                params.append(self._coerce(spec['column'], value))
+        # O groupby do pandas descarta chaves nulas; replicamos aqui
+        clauses.extend(f"{_quote(c)} IS NOT NULL" for c in not_null)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def aggregate(self, spec) -> pd.DataFrame:
+        metrics, group_by, filters = spec['metrics'], spec['group_by'], spec['filters']
+        _check_columns(self.columns, group_by + [m['column'] for m in metrics] + [f['column'] for f in filters])
+        select = [_quote(c) for c in group_by]
+        select += [f"{_SQL_AGGREGATIONS[m['agg']].format(col=_quote(m['column']))} AS {_quote(m['alias'])}" for m in metrics]
+        where, params = self._where(filters, not_null=group_by)
+        sql = f"SELECT {', '.join(select)}, COUNT(*) AS __n FROM {self._source}{where}"
+        if group_by:
+            sql += f" GROUP BY {', '.join(_quote(c) for c in group_by)}"
+        # Desempate pelas chaves de agrupamento, como no groupby(sort=True) seguido de ordenação estável
+        order_terms = []
+        if spec['order'] is not None:
+            order_terms.append(f"{_quote(spec['order']['by'])} {'ASC' if spec['order']['ascending'] else 'DESC'} NULLS LAST")
+        order_terms += [f"{_quote(c)} ASC" for c in group_by]
+        if order_terms:
+            sql += f" ORDER BY {', '.join(order_terms)}"
+        if spec['limit'] is not None:
+            sql += f" LIMIT {int(spec['limit'])}"
+        result = self._query(sql, params).df()
+        result = result[result['__n'] > 0]
+        return result[group_by + [m['alias'] for m in metrics]].reset_index(drop=True)
+
+    def scan(self, columns, filters) -> pd.DataFrame:
+        _check_columns(self.columns, list(columns) + [f['column'] for f in filters])
+        where, params = self._where(filters)
+        sql = f"SELECT {', '.join(_quote(c) for c in columns)} FROM {self._source}{where}"
+        return self._query(sql, params).df()
+
+    def fingerprint(self) -> str:
+        # Metadados dos arquivos (nome, tamanho, data de modificação): muda a cada atualização sem ler os dados
+        digest = hashlib.sha256()
+        for path in sorted(glob.glob(self.parquet_path)):
+            stat = os.stat(path)
+            digest.update(f"{path}|{stat.st_size}|{stat.st_mtime_ns}".encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+
+# --- Interface comum dos backends ---
+# As ferramentas recebem o DataFrame em memória ou um DuckDBBackend e chamam apenas estas funções.
+
+def aggregate(source, metrics, group_by=None, filters=None, order=None, limit=None) -> pd.DataFrame:
+    spec = _compile_spec(metrics, group_by, filters, order, limit)
+    if isinstance(source, pd.DataFrame):
+        return _aggregate_pandas(source, spec)
+    return source.aggregate(spec)
+
+
+def scan(source, columns, filters=None) -> pd.DataFrame:
+    filters = _normalize_filters(filters)
+    if isinstance(source, pd.DataFrame):
+        return _scan_pandas(source, columns, filters)
+    return source.scan(list(columns), filters)
+
+
+def dataset_fingerprint(source) -> str:
+    if isinstance(source, pd.DataFrame):
+        digest = hashlib.sha256(pd.util.hash_pandas_object(source, index=False).to_numpy().tobytes())
+        digest.update(','.join(source.columns).encode('utf-8'))
+        return digest.hexdigest()[:16]
+    return source.fingerprint()
+
+
+def load_backend(backend: str, csv_path: str = None, parquet_path: str = None):
+    if backend == 'pandas':
+        return add_derived_columns(pd.read_csv(csv_path, delimiter=";", encoding="utf-8-sig"))
+    if backend == 'duckdb':
+        return DuckDBBackend(parquet_path)
+    raise ValueError(f"Backend de consulta '{backend}' desconhecido. Use 'pandas' ou 'duckdb'.")
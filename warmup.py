@@ -0,0 +1,116 @@
+import json
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+
+import analysis_tools
+import query_engine
+
+logger = logging.getLogger(__name__)
+
+
+# --- Pré-aquecimento do cache de resultados das ferramentas ---
+# Após o carregamento dos dados, executa em segundo plano as chamadas de ferramenta mais comuns e guarda os
+# resultados no cache, para que os primeiros usuários não paguem pela agregação e pelos gráficos.
+# A lista pode vir dos segredos (WARMUP_CALLS), por exemplo a partir de ToolResultCache.most_requested().
+
+def default_warmup_calls(df) -> list:
+    # Análises padrão: top empresas por SALARIO no último ano, top setores por TOTAL_REMUNERACAO_ORGAO
+    # no último ano e a tendência de cada ORGAO_ADMINISTRACAO ao longo de todo o período
+    years = query_engine.aggregate(df, metrics=[{'column': 'ANO_REFER', 'agg': 'min'}, {'column': 'ANO_REFER', 'agg': 'max'}])
+    first_year, last_year = int(years.loc[0, 'ANO_REFER_min']), int(years.loc[0, 'ANO_REFER_max'])
+    orgaos = query_engine.aggregate(df, metrics=[{'column': 'ANO_REFER', 'agg': 'count'}], group_by=['ORGAO_ADMINISTRACAO'],
+                                    order={'by': 'ANO_REFER_count', 'direction': 'desc'})
+    calls = [
+        {'tool': 'get_top_companies_by_salary', 'args': {'num_companies': 10}},
+        {'tool': 'get_top_sectors_by_avg_total_remuneration', 'args': {'num_sectors': 5, 'year': last_year}},
+        {'tool': 'get_top_sectors_by_avg_total_remuneration', 'args': {'num_sectors': 10, 'year': last_year}},
+    ]
+    for orgao in orgaos['ORGAO_ADMINISTRACAO']:
+        calls.append({'tool': 'get_remuneration_trend_by_orgao',
+                      'args': {'orgao': orgao, 'start_year': first_year, 'end_year': last_year}})
+    return calls
+
+
+def most_requested_from_log(lines, n: int = 10) -> list:
+    # Deriva a lista de pré-aquecimento das linhas "tool_call {...}" registradas por analysis_tools.run_tool,
+    # que sobrevivem a reinícios e deploys (ao contrário do contador em memória do cache)
+    counts = Counter()
+    for line in lines:
+        _, marker, payload = line.partition('tool_call ')
+        if not marker:
+            continue
+        try:
+            call = json.loads(payload)
+        except ValueError:
+            continue
+        counts[json.dumps(call, sort_keys=True, ensure_ascii=False)] += 1
+    return [json.loads(call) for call, _ in counts.most_common(n)]
+
+
+class WarmupJob:
+    def __init__(self, df, calls: list, cache, dataset_fingerprint: str):
+        self._df = df
+        self._calls = list(calls)
+        self._cache = cache
+        self._fingerprint = dataset_fingerprint
+        self._lock = threading.Lock()
+        self._thread = None
+        self._done = 0
+        self._failed = []
+        self._current = None
+        self._started_at = None
+        self._finished_at = None
+
+    def start(self):
+        # Thread daemon: a interface não espera o pré-aquecimento para ficar interativa
+        with self._lock:
+            if self._thread is not None:
+                return self
+            self._started_at = time.monotonic()
+            self._thread = threading.Thread(target=self._run, name='cache-warmup', daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        # Progresso também no log: o painel de administração só existe com ADMIN_PASSWORD configurada
+        logger.info("Pré-aquecimento iniciado: %d chamadas (dataset %s)", len(self._calls), self._fingerprint)
+        for call in self._calls:
+            with self._lock:
+                self._current = call['tool']
+            try:
+                tool_output = analysis_tools.run_tool(call['tool'], self._df, call.get('args', {}),
+                                                      cache=self._cache, dataset_fingerprint=self._fingerprint, record_call=False)
+                if 'columns' not in tool_output:
+                    raise RuntimeError(tool_output.get('text', 'sem dados'))
+            except Exception as e:
+                logger.warning("Pré-aquecimento: falha em %s %s: %s", call['tool'], json.dumps(call.get('args', {}), ensure_ascii=False), e)
+                with self._lock:
+                    self._failed.append({'tool': call['tool'], 'args': call.get('args', {}), 'error': str(e)})
+            with self._lock:
+                self._done += 1
+        with self._lock:
+            self._current = None
+            self._finished_at = time.monotonic()
+            elapsed, failed = self._finished_at - self._started_at, len(self._failed)
+        logger.info("Pré-aquecimento concluído: %d/%d chamadas em %.1fs, %d falha(s)", len(self._calls) - failed, len(self._calls), elapsed, failed)
+
+    def status(self) -> dict:
+        with self._lock:
+            end = self._finished_at if self._finished_at is not None else time.monotonic()
+            return {
+                'total': len(self._calls),
+                'done': self._done,
+                'failed': list(self._failed),
+                'current': self._current,
+                'running': self._thread is not None and self._finished_at is None,
+                'elapsed_s': (end - self._started_at) if self._started_at is not None else 0.0,
+            }
+
+
+if __name__ == '__main__':
+    # Uso: python warmup.py app.log [N]  -> JSON pronto para o segredo WARMUP_CALLS
+    with open(sys.argv[1], encoding='utf-8') as f:
+        print(json.dumps(most_requested_from_log(f, int(sys.argv[2]) if len(sys.argv) > 2 else 10), ensure_ascii=False))